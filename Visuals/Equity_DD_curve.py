@@ -1,61 +1,119 @@
 """
-Displays the cumulative equity over time, showing the 
-growth of the strategy from the inital capital on a day 
+Displays the cumulative equity over time, showing the
+growth of the strategy from the inital capital on a day
 to day basis
 """
 import pandas as pd
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
+from backtester.downsample import POINTS, LineLevels
+from backtester.results_store import ResultsStore
 
-tf = pd.read_csv("results/TrendFollowing_full_equity.csv", index_col=0)
-mr = pd.read_csv("results/MeanReversion_full_equity.csv", index_col=0)
-tf.index = pd.to_datetime(tf.index, errors='coerce')
-mr.index = pd.to_datetime(mr.index, errors='coerce')
-
-equity_min = min(tf['Portfolio_value'].min(), mr['Portfolio_value'].min()) * 0.95
-equity_max = max(tf['Portfolio_value'].max(), mr['Portfolio_value'].max()) * 1.05
-dd_min = min(tf['Drawdown'].min(), mr['Drawdown'].min()) * 1.1
-
-fig = make_subplots(specs=[[{"secondary_y": True}]])
-fig.add_trace(go.Scatter(x=tf.index, y=tf['Portfolio_value'], 
-                        name='Trend Following Equity', 
-                        line=dict(color="#5f1c1c", width=2.5)), 
-              secondary_y=False)
-fig.add_trace(go.Scatter(x=tf.index, y=tf['Drawdown'], 
-                        name='Trend Following DD', 
-                        line=dict(color="#a45454", width=1),
-                        fill='tozeroy', fillcolor='rgba(164,84,84,0.3)'), 
-              secondary_y=True)
-
-fig.add_trace(go.Scatter(x=mr.index, y=mr['Portfolio_value'], 
-                        name='Mean Reversion Equity', 
-                        line=dict(color="#08244f", width=2.5)),
-              secondary_y=False)
-fig.add_trace(go.Scatter(x=mr.index, y=mr['Drawdown'], 
-                        name='Mean Reversion DD', 
-                        line=dict(color='#7db2e6', width=1),
-                        fill='tozeroy', fillcolor='rgba(125,178,230,0.3)'), 
-              secondary_y=True)
-
-fig.update_yaxes(title_text="Equity $", secondary_y=False, range=[equity_min, equity_max], side="left")
-fig.update_yaxes(title_text="Drawdown %", secondary_y=True, range=[dd_min, 0], side="right", showgrid=False)
-fig.update_xaxes(title_text="Date")
-fig.update_layout(
-    height=600,  
-    title="Equity Curves w/ Drawdown Overlay",
-    hovermode='x unified',
-    showlegend=True,
-    legend=dict(
-        orientation="h", 
-        yanchor="bottom", 
-        y=-0.9,     
-        xanchor="center",
-        x=0.5,    
-        bgcolor="rgba(0,0,0,.5)"
-    ), margin=dict(b=200, pad=10)
-)
-fig.update_layout(template='plotly_dark')
-fig.update_layout(xaxis=dict(rangeslider=dict(visible=True), type="date"))
-
-fig.show()
+# (equity, drawdown) colors of the first runs, later runs get plotly's defaults
+COLORS = [("#5f1c1c", "#a45454", 'rgba(164,84,84,0.3)'), ("#08244f", '#7db2e6', 'rgba(125,178,230,0.3)')]
 
+
+def _curves(runs):
+    """{name: (dates, equity, drawdown)} from performance frames, equity Series or tester results"""
+    if isinstance(runs, list):
+        runs = {f"{r['strategy']} {r['period']}": r['performance'] for r in runs}
+    curves = {}
+    for name, run in runs.items():
+        equity = run['Portfolio_value'] if isinstance(run, pd.DataFrame) else run
+        dates = pd.to_datetime(equity.index, errors='coerce', format='ISO8601')
+        # drop the START row
+        keep = ~dates.isna()
+        equity = equity.to_numpy(dtype=float)[keep]
+        if isinstance(run, pd.DataFrame) and 'Drawdown' in run:
+            drawdown = run['Drawdown'].to_numpy(dtype=float)[keep]
+        else:
+            peak = pd.Series(equity).cummax().to_numpy()
+            drawdown = (equity - peak) / peak
+        curves[name] = (dates[keep], equity, drawdown)
+    return curves
+
+
+def equityComparison(runs, points=POINTS, drawdown=True, zoom=False, show=True):
+    """
+    Equity curves of any number of runs with their drawdowns overlaid, every
+    series downsampled to at most points points (LTTB over cached min/max levels)
+
+    Args:
+        runs (dict or list): name -> performance frame (BTE.build_results) or
+                             equity Series, or a list of tester.run_strategy_test results
+        points (int): points drawn per series
+        drawdown (bool): overlay the drawdowns on a second axis
+        zoom (bool): return a FigureWidget that redraws the visible range at
+                     full detail on every zoom (in a notebook)
+        show (bool): open the figure, else only return it
+    """
+    curves = _curves(runs)
+    fig = make_subplots(specs=[[{"secondary_y": True}]])
+    levels = []
+    for k, (name, (dates, equity, dd)) in enumerate(curves.items()):
+        line, dd_line, fill = COLORS[k] if k < len(COLORS) else (None, None, None)
+        series = LineLevels(dates, equity, points)
+        fig.add_trace(go.Scatter(**series.view(points=points),
+                                name=f'{name} Equity',
+                                line=dict(color=line, width=2.5)),
+                      secondary_y=False)
+        levels.append(series)
+        if not drawdown:
+            continue
+        series = LineLevels(dates, dd, points)
+        fig.add_trace(go.Scatter(**series.view(points=points),
+                                name=f'{name} DD',
+                                line=dict(color=dd_line, width=1),
+                                fill='tozeroy', fillcolor=fill),
+                      secondary_y=True)
+        levels.append(series)
+
+    equity_min = min(equity.min() for _, equity, _ in curves.values()) * 0.95
+    equity_max = max(equity.max() for _, equity, _ in curves.values()) * 1.05
+    fig.update_yaxes(title_text="Equity $", secondary_y=False, range=[equity_min, equity_max], side="left")
+    if drawdown:
+        dd_min = min(dd.min() for _, _, dd in curves.values()) * 1.1
+        fig.update_yaxes(title_text="Drawdown %", secondary_y=True, range=[dd_min, 0], side="right", showgrid=False)
+    fig.update_xaxes(title_text="Date")
+    fig.update_layout(
+        height=600,
+        title="Equity Curves w/ Drawdown Overlay" if drawdown else "Equity Curves",
+        hovermode='x unified',
+        showlegend=True,
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=-0.9,
+            xanchor="center",
+            x=0.5,
+            bgcolor="rgba(0,0,0,.5)"
+        ), margin=dict(b=200, pad=10)
+    )
+    fig.update_layout(template='plotly_dark')
+    fig.update_layout(xaxis=dict(rangeslider=dict(visible=True), type="date"))
+
+    if zoom:
+        from Visuals.zoom import followZoom
+        fig = followZoom(fig, levels, points)
+    if show:
+        fig.show()
+    return fig
+
+
+def equityDrawdown(store_path="results/runs.bin", points=POINTS, show=True):
+    """
+    Equity curves of the full period runs with their drawdowns overlaid
+
+    Args:
+        store_path (str): results store written by tester.main
+        points (int): points drawn per series
+        show (bool): open the figure, else only return it
+    """
+    store = ResultsStore(store_path)
+    tf, _, _ = store.load("TrendFollowing_full")
+    mr, _, _ = store.load("MeanReversion_full")
+    return equityComparison({'Trend Following': tf, 'Mean Reversion': mr}, points, show=show)
+
+
+if __name__ == "__main__":
+    equityDrawdown()
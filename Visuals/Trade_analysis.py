@@ -1,17 +1,24 @@
-import pandas as pd
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-from pathlib import Path
+from backtester.results_store import ResultsStore
 
 
-def tradeAnalysis():
+def tradeAnalysis(store_path="results/runs.bin", show=True):
+    """
+    Win/loss counts and returns of the full period runs
+
+    Args:
+        store_path (str): results store written by tester.main
+        show (bool): open the figure, else only return it
+    """
     fig = make_subplots(rows=2, cols=2, subplot_titles=("Trend Following", "Mean Reversion"), 
                         specs=[[{"type": "pie"}, {"type": "pie"}],
                                 [{"type": "bar"}, {"type": "bar"}]], vertical_spacing=0.05)
     
-    df1 = pd.read_csv("results/TrendFollowing_full_trades.csv")
+    store = ResultsStore(store_path)
+    _, df1, _ = store.load("TrendFollowing_full")
     df1['Result'] = df1['pnl'].apply(lambda x: 'Win' if x > 0 else 'Loss')
-    df2 = pd.read_csv("results/MeanReversion_full_trades.csv")
+    _, df2, _ = store.load("MeanReversion_full")
     df2['Result'] = df2['pnl'].apply(lambda x: 'Win' if x > 0 else 'Loss')
 
     labels1 = df1['Result'].value_counts().index
@@ -36,6 +43,10 @@ def tradeAnalysis():
     fig.update_layout(height=650, showlegend=False, title={'text':"Trade Analysis", 'x':0.5, 'xanchor': 'center', 'y': 0.95}, margin=dict(t=100, b=40, l=40, r=40))
     fig.update_traces(textposition='inside', textinfo='percent+label', selector=dict(type='pie'))
     fig.update_layout(template='plotly_dark')
-    fig.show()
+    if show:
+        fig.show()
+    return fig
+
 
-tradeAnalysis()
\ No newline at end of file
+if __name__ == "__main__":
+    tradeAnalysis()
@@ -1,18 +1,51 @@
 import plotly.graph_objects as go
 import pandas as pd
+from backtester.downsample import POINTS, CandleLevels
 
-df = pd.read_csv('Data/clean_stock_data.csv', parse_dates=['Date'])
+COLORS = {
+    'AAPL': ('#08244f', '#7db2e6'),
+    'JNJ': ('#5f1c1c', '#a45454'),
+    'SPY': ('#2a095b', '#ac8fd8'),
+}
 
-aapl = df[df['Ticker']=='AAPL'].sort_values('Date').reset_index(drop=True)
-jnj = df[df['Ticker']=='JNJ'].sort_values('Date').reset_index(drop=True)
-spy = df[df['Ticker']=='SPY'].sort_values('Date').reset_index(drop=True)
 
-fig = go.Figure()
+def candlestickChart(path='Data/clean_stock_data.csv', tickers=('AAPL', 'JNJ', 'SPY'), points=POINTS,
+                     data=None, zoom=False, show=True):
+    """
+    Candlesticks of a few tickers of the long OHLCV table, consecutive candles
+    merged (first open, highest high, lowest low, last close) down to at most
+    points candles per ticker
 
-fig.add_trace(go.Candlestick(x=aapl['Date'], open=aapl['Open'], high=aapl['High'], low=aapl['Low'], close=aapl['Close'], name='AAPL', increasing=dict(line=dict(color='#08244f'), fillcolor='#08244f'), decreasing=dict(line=dict(color='#7db2e6'), fillcolor='#7db2e6')))
-fig.add_trace(go.Candlestick(x=jnj['Date'], open=jnj['Open'], high=jnj['High'], low=jnj['Low'], close=jnj['Close'], name='JNJ', increasing=dict(line=dict(color='#5f1c1c'), fillcolor='#5f1c1c'), decreasing=dict(line=dict(color='#a45454'), fillcolor='#a45454')))
-fig.add_trace(go.Candlestick(x=spy['Date'], open=spy['Open'], high=spy['High'], low=spy['Low'], close=spy['Close'], name='SPY', increasing=dict(line=dict(color="#2a095b"), fillcolor='#2a095b'), decreasing=dict(line=dict(color="#ac8fd8"), fillcolor='#ac8fd8')))
+    Args:
+        path (str): Date, Ticker, Close, High, Low, Open, Volume CSV
+        tickers (list): tickers to draw
+        points (int): candles drawn per ticker
+        data (pd.DataFrame): the long table already in memory, read from path when not given
+        zoom (bool): return a FigureWidget that redraws the visible range at
+                     full detail on every zoom (in a notebook)
+        show (bool): open the figure, else only return it
+    """
+    df = pd.read_csv(path, parse_dates=['Date']) if data is None else data
 
-fig.update_layout(title="AAPL, JNJ, SPY Candlestick", yaxis_title="Price $", xaxis_title='Date', height=600, showlegend=True, template='plotly_dark')
+    fig = go.Figure()
+    levels = []
+    for ticker in tickers:
+        bars = df[df['Ticker']==ticker].sort_values('Date').reset_index(drop=True)
+        up, down = COLORS.get(ticker, ('#08244f', '#7db2e6'))
+        series = CandleLevels(pd.to_datetime(bars['Date']).to_numpy(), bars['Open'], bars['High'], bars['Low'],
+                              bars['Close'], points)
+        fig.add_trace(go.Candlestick(**series.view(points=points), name=ticker, increasing=dict(line=dict(color=up), fillcolor=up), decreasing=dict(line=dict(color=down), fillcolor=down)))
+        levels.append(series)
 
-fig.show()
\ No newline at end of file
+    fig.update_layout(title=f"{', '.join(tickers)} Candlestick", yaxis_title="Price $", xaxis_title='Date', height=600, showlegend=True, template='plotly_dark')
+
+    if zoom:
+        from Visuals.zoom import followZoom
+        fig = followZoom(fig, levels, points)
+    if show:
+        fig.show()
+    return fig
+
+
+if __name__ == "__main__":
+    candlestickChart()
@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from backtester.downsample import POINTS
+
+
+def _positions(x, x_range):
+    """[start, stop) positions of x inside the axis range, the whole series when autoranged"""
+    if not x_range:
+        return 0, len(x)
+    low, high = x_range
+    if np.issubdtype(x.dtype, np.datetime64):
+        low, high = pd.Timestamp(low).to_datetime64(), pd.Timestamp(high).to_datetime64()
+    # one point past each edge so the lines run to the border
+    return max(np.searchsorted(x, low) - 1, 0), np.searchsorted(x, high, side='right') + 1
+
+
+def followZoom(fig, levels, points=POINTS):
+    """
+    FigureWidget redrawing every trace from its levels for the visible x range
+    after each zoom / pan (needs a notebook with ipywidgets)
+
+    Args:
+        fig (go.Figure): chart whose traces were drawn from levels
+        levels (list): backtester.downsample LineLevels / CandleLevels, one per trace of fig
+        points (int): points drawn per trace
+    """
+    widget = go.FigureWidget(fig)
+
+    def redraw(layout, x_range):
+        with widget.batch_update():
+            for trace, series in zip(widget.data, levels):
+                trace.update(series.view(*_positions(series.x, x_range), points=points))
+
+    widget.layout.on_change(redraw, 'xaxis.range')
+    return widget
@@ -0,0 +1,246 @@
+import argparse
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from backtester.engine import BTE
+from backtester.portfolio import Portfolio
+from backtester.strategies import TrendFollowing, MeanReversion
+from backtester.synthetic import synthetic_closes
+
+"""
+Throughput benchmarks on synthetic data
+    1) run_backtest ~ full event loop (TrendFollowing and MeanReversion)
+    2) record_equity ~ ledger appends
+    3) process_day / process_bar ~ strategy signal generation alone (per
+                                   ticker / whole bar interfaces)
+    4) comp_performance ~ metrics on a finished run
+    5) sweep ~ small parameter grid through sweep.run_sweep
+    6) import ~ cold start: a fresh interpreter importing an entry point
+                (the CLI, the headless tester, the plotting modules)
+
+Each benchmark runs at several (days, tickers, bars_per_day) scales and
+reports seconds, bars/sec (price rows per second) and peak traced memory
+(measured in a second, traced run so tracing doesn't skew the timing).
+Results are written to JSON and compared against a stored baseline; a
+benchmark slower than the baseline by more than the tolerance is reported
+as a regression (exit code 1).
+
+    python -m backtester.benchmark --out results/benchmark.json
+    python -m backtester.benchmark --save-baseline
+"""
+
+SCALES = {
+    'small': (250, 10, 1),
+    'medium': (1000, 100, 1),
+    'large': (2520, 500, 1),
+    'intraday': (20, 20, 390),
+}
+QUICK_SCALES = ['small']
+IMPORTS = ['backtester.cli', 'backtester.tester', 'backtester.sweep', 'Visuals.Equity_DD_curve']
+BASELINE = "results/benchmark_baseline.json"
+
+
+@contextlib.contextmanager
+def _quiet():
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def _measure(setup, bars, memory=True, repeat=3):
+    """
+    Times fn = setup() untraced (best of repeat runs, each on a fresh setup()),
+    then (if memory) runs it once more under tracemalloc for the peak, so
+    tracing doesn't skew the timing
+    """
+    seconds = float('inf')
+    with _quiet():
+        for _ in range(repeat):
+            fn = setup()
+            start = time.perf_counter()
+            fn()
+            seconds = min(seconds, time.perf_counter() - start)
+    result = {'seconds': seconds,
+              'bars_per_sec': bars / seconds if seconds else float('inf')}
+    if memory:
+        with _quiet():
+            fn = setup()
+            tracemalloc.start()
+            fn()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        result['peak_mb'] = peak / 2**20
+    return result
+
+
+def bench_run_backtest(data, strategy_class, memory=True):
+    def setup():
+        engine = BTE(Portfolio(start_cash=1e6), strategy_class(), data=data)
+        return engine.run_backtest
+    return _measure(setup, len(data), memory)
+
+
+def bench_record_equity(data, memory=True):
+    dates = list(data.index)
+
+    def setup():
+        portfolio = Portfolio(start_cash=1e6, tickers=list(data.columns))
+
+        def fn():
+            for date in dates:
+                portfolio.record_equity(date)
+        return fn
+    return _measure(setup, len(data), memory)
+
+
+def bench_process_day(data, strategy_class, memory=True):
+    tickers = list(data.columns)
+    prices = data.to_numpy()
+
+    def setup():
+        strategy = strategy_class()
+
+        def fn():
+            for row in prices:
+                for ticker, close in zip(tickers, row):
+                    strategy.process_day(ticker, close)
+                strategy.signals = []
+        return fn
+    return _measure(setup, len(data), memory)
+
+
+def bench_process_bar(data, strategy_class, memory=True):
+    prices = data.to_numpy()
+
+    def setup():
+        strategy = strategy_class()
+
+        def fn():
+            for row in prices:
+                strategy.process_bar(row)
+        return fn
+    return _measure(setup, len(data), memory)
+
+
+def bench_comp_performance(data, memory=True):
+    with _quiet():
+        engine = BTE(Portfolio(start_cash=1e6), TrendFollowing(), data=data)
+        performance = engine.run_backtest()
+    return _measure(lambda: lambda: engine.comp_performance(performance), len(data), memory)
+
+
+def bench_sweep(data, memory=True):
+    from backtester.sweep import grid, run_sweep
+    specs = {'TrendFollowing': grid(short_window=[5, 10], long_window=[20, 50])}
+    # tracemalloc only sees this process, peak_mb excludes the workers
+    return _measure(lambda: lambda: run_sweep(specs, periods=[(None, None)], data=data),
+                    4 * len(data), memory, repeat=1)
+
+
+def bench_import(module, repeat=5):
+    """Best of repeat fresh interpreters importing module, None if it doesn't import"""
+    seconds = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        done = subprocess.run([sys.executable, "-c", f"import {module}"], capture_output=True)
+        seconds = min(seconds, time.perf_counter() - start)
+        if done.returncode:
+            return None
+    return {'seconds': seconds}
+
+
+def run_benchmarks(scales, include_sweep=True, memory=True, include_imports=True):
+    """Returns {benchmark name: {scale name: measurements}}"""
+    results = {}
+    if include_imports:
+        for module in IMPORTS:
+            result = bench_import(module)
+            if result is None:
+                print(f"{f'import[{module}]':<32} {'cold':<9} (not importable here, skipped)")
+                continue
+            results[f'import[{module}]'] = {'cold': result}
+            print(f"{f'import[{module}]':<32} {'cold':<9} {result['seconds']:8.3f}s")
+    for scale in scales:
+        days, tickers, bars_per_day = SCALES[scale]
+        data = synthetic_closes(days, tickers, bars_per_day)
+        runs = {
+            'run_backtest[TrendFollowing]': lambda: bench_run_backtest(data, TrendFollowing, memory),
+            'run_backtest[MeanReversion]': lambda: bench_run_backtest(data, MeanReversion, memory),
+            'record_equity': lambda: bench_record_equity(data, memory),
+            'process_day[TrendFollowing]': lambda: bench_process_day(data, TrendFollowing, memory),
+            'process_bar[TrendFollowing]': lambda: bench_process_bar(data, TrendFollowing, memory),
+            'comp_performance': lambda: bench_comp_performance(data, memory),
+        }
+        if include_sweep:
+            runs['sweep'] = lambda: bench_sweep(data, memory)
+        for name, run in runs.items():
+            result = results.setdefault(name, {})[scale] = run()
+            peak = f"{result['peak_mb']:8.1f} MB" if 'peak_mb' in result else ""
+            print(f"{name:<32} {scale:<9} {result['seconds']:8.3f}s "
+                  f"{result['bars_per_sec']:12,.0f} bars/s {peak}")
+    return results
+
+
+def compare(results, baseline, tolerance=0.2, min_seconds=0.01):
+    """
+    Lists (name, scale, slowdown) for every benchmark more than tolerance slower
+    than baseline. Baselines under min_seconds are too noisy to compare and skipped
+    """
+    regressions = []
+    for name, scales in results.items():
+        for scale, result in scales.items():
+            old = baseline.get(name, {}).get(scale)
+            if old is None or old['seconds'] < min_seconds:
+                continue
+            slowdown = result['seconds'] / old['seconds'] - 1
+            if slowdown > tolerance:
+                regressions.append((name, scale, slowdown))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtester throughput benchmarks")
+    parser.add_argument("--scales", nargs="*", choices=list(SCALES), default=None)
+    parser.add_argument("--quick", action="store_true", help=f"only run {QUICK_SCALES}")
+    parser.add_argument("--no-sweep", action="store_true")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--no-imports", action="store_true", help="skip the import time benchmarks")
+    parser.add_argument("--out", default="results/benchmark.json")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown vs baseline (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    scales = args.scales or (QUICK_SCALES if args.quick else list(SCALES))
+    results = run_benchmarks(scales, include_sweep=not args.no_sweep, memory=not args.no_memory,
+                             include_imports=not args.no_imports)
+
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results: {args.out}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare against (run with --save-baseline)")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    for name, scale, slowdown in regressions:
+        print(f"REGRESSION {name} [{scale}]: {slowdown:+.0%} vs baseline")
+    if not regressions:
+        print("No regressions vs baseline")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+import argparse
+import importlib
+import os
+import sys
+
+"""
+Command line entry point: python -m backtester <command> [args]
+    1) run ~ both strategies over every test period (tester.main), or one
+             --strategy over one period
+    2) sweep / walkforward / robustness / paper / bench ~ the module's own
+                                                        command line
+    3) plot ~ builds only the figures asked for (candles, equity, trades),
+              shown or written to HTML
+    4) report ~ summary table of the runs in a results store, read from its index
+
+Every module is imported inside the command that needs it, so a command
+never pays for another one's imports: plotly is only loaded by plot, and
+'python -m backtester' itself imports nothing but the standard library.
+"""
+
+MODULES = {
+    'sweep': 'backtester.sweep',
+    'walkforward': 'backtester.walkforward',
+    'robustness': 'backtester.robustness',
+    'paper': 'backtester.paper',
+    'bench': 'backtester.benchmark',
+}
+PLOTS = {
+    'candles': ('Visuals.candlestick', 'candlestickChart'),
+    'equity': ('Visuals.Equity_DD_curve', 'equityDrawdown'),
+    'trades': ('Visuals.Trade_analysis', 'tradeAnalysis'),
+}
+
+
+def run(argv):
+    parser = argparse.ArgumentParser(prog="python -m backtester run",
+                                     description="Backtest both strategies over every period, or one run")
+    parser.add_argument("--strategy", default=None, help="only this strategy (TrendFollowing, MeanReversion)")
+    parser.add_argument("--start", default=None)
+    parser.add_argument("--end", default=None)
+    parser.add_argument("--cash", type=float, default=10000)
+    parser.add_argument("--warm-start", action="store_true",
+                        help="warm the indicators on the bars before each period instead of starting cold")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log every order the portfolio rejects")
+    args = parser.parse_args(argv)
+    if args.verbose:
+        import logging
+        logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    from backtester import tester
+    if args.strategy is None:
+        return tester.main(warm_start=args.warm_start)
+
+    from backtester.sweep import STRATEGIES
+    if args.strategy not in STRATEGIES:
+        parser.error(f"unknown strategy {args.strategy!r}, expected one of {list(STRATEGIES)}")
+    result = tester.run_strategy_test(STRATEGIES[args.strategy], args.strategy, args.start, args.end,
+                                      tester.ensure_directories(), start_cash=args.cash,
+                                      warmup=None if args.warm_start else 0)
+    print(f"{args.strategy} {result['period']}: {result['total_return_pct']:+.1f}% "
+          f"({result['trades']} trades), final value {result['final_value']:,.2f}")
+    for name, value in result['stats'].items():
+        print(f"  {name:<14} {value:.4f}")
+
+
+def plot(argv):
+    parser = argparse.ArgumentParser(prog="python -m backtester plot", description="Build charts on request")
+    parser.add_argument("charts", nargs="*", help=f"any of {list(PLOTS)} (default: all)")
+    parser.add_argument("--store", default="results/runs.bin", help="results store for equity / trades")
+    parser.add_argument("--html", default=None, help="write <dir>/<chart>.html instead of opening the charts")
+    parser.add_argument("--points", type=int, default=2000, help="points / candles drawn per series")
+    args = parser.parse_args(argv)
+    unknown = [chart for chart in args.charts if chart not in PLOTS]
+    if unknown:
+        parser.error(f"unknown charts {unknown}, expected any of {list(PLOTS)}")
+    # same bound as backtester.downsample.MIN_POINTS (not imported: it pulls in numpy)
+    if args.points < 4:
+        parser.error(f"--points must be at least 4, got {args.points}")
+
+    for chart in args.charts or list(PLOTS):
+        module, function = PLOTS[chart]
+        build = getattr(importlib.import_module(module), function)
+        if chart == 'candles':
+            fig = build(points=args.points, show=False)
+        elif chart == 'equity':
+            fig = build(args.store, args.points, show=False)
+        else:
+            fig = build(args.store, show=False)
+        if args.html is None:
+            fig.show()
+        else:
+            os.makedirs(args.html, exist_ok=True)
+            path = os.path.join(args.html, f"{chart}.html")
+            fig.write_html(path)
+            print(f"-> {path}")
+
+
+def report(argv):
+    parser = argparse.ArgumentParser(prog="python -m backtester report",
+                                     description="Metrics of the runs in a results store")
+    parser.add_argument("runs", nargs="*", help="run ids (default: every run)")
+    parser.add_argument("--store", default="results/runs.bin")
+    parser.add_argument("--sort", default=None, help="sort by this metric, best first")
+    args = parser.parse_args(argv)
+
+    from backtester.results_store import ResultsStore
+    summary = ResultsStore(args.store).summary()
+    if summary.empty:
+        print(f"No runs in {args.store}")
+        return 1
+    if args.runs:
+        summary = summary[summary['run_id'].isin(args.runs)]
+    if args.sort:
+        summary = summary.sort_values(args.sort, ascending=False)
+    print(summary.to_string(index=False, float_format=lambda v: f"{v:,.4f}"))
+
+
+COMMANDS = {'run': run, 'plot': plot, 'report': report}
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    names = list(COMMANDS) + list(MODULES)
+    if not argv or argv[0] in ('-h', '--help') or argv[0] not in names:
+        print(f"usage: python -m backtester {{{','.join(names)}}} [args]")
+        print("       python -m backtester <command> --help")
+        return 0 if not argv or argv[0] in ('-h', '--help') else 2
+    command, rest = argv[0], argv[1:]
+    if command in COMMANDS:
+        return COMMANDS[command](rest)
+    return importlib.import_module(MODULES[command]).main(rest)
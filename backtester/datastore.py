@@ -0,0 +1,199 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+"""
+Binary market data cache
+    1) dates ~ trading dates (sorted, 'YYYY-MM-DD')
+    2) tickers ~ universe, in the column order of Data/date_close_data.csv
+    3) close ~ days x tickers closing prices
+    4) ohlcv ~ days x tickers x fields (Close, High, Low, Open, Volume) from Data/clean_stock_data.csv
+
+The CSVs are parsed once and written as .npy files under Data/.cache. Later
+loads memory-map those files (np.load(mmap_mode='r')), so every engine in a
+process, and every worker process, reads the same pages instead of its own
+parsed copy. The cache is rebuilt when a source file's size/mtime changes
+and its content hash no longer matches.
+
+OHLCVIndex wraps a days x tickers x fields array with date -> row and
+ticker -> column dicts, so any (date, ticker) bar is an O(1) lookup.
+"""
+
+CLOSE_CSV = "Data/date_close_data.csv"
+OHLCV_CSV = "Data/clean_stock_data.csv"
+CACHE_DIR = "Data/.cache"
+FIELDS = ['Close', 'High', 'Low', 'Open', 'Volume']
+
+_stores = {}
+
+
+def _fingerprint(path, with_hash=True):
+    stat = os.stat(path)
+    info = {'size': stat.st_size, 'mtime': stat.st_mtime}
+    if with_hash:
+        digest = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        info['sha1'] = digest.hexdigest()
+    return info
+
+
+class MarketData:
+    def __init__(self, close_csv=CLOSE_CSV, ohlcv_csv=OHLCV_CSV, cache_dir=CACHE_DIR):
+        """
+        Loads the market data cache, building or rebuilding it from the CSVs if needed
+
+        Args:
+            close_csv (str): Date x ticker closing prices
+            ohlcv_csv (str): long format Date, Ticker, Close, High, Low, Open, Volume
+            cache_dir (str): where the .npy files and meta.json live
+        """
+        self.close_csv = close_csv
+        self.ohlcv_csv = ohlcv_csv
+        self.cache_dir = cache_dir
+        self._close_frame = None
+
+        if not self._cache_valid():
+            self._build()
+        with open(os.path.join(cache_dir, 'meta.json')) as f:
+            meta = json.load(f)
+        self.tickers = meta['tickers']
+        self.fields = meta['fields']
+        self.dates = np.load(os.path.join(cache_dir, 'dates.npy'))
+        self.close = np.load(os.path.join(cache_dir, 'close.npy'), mmap_mode='r')
+        self.ohlcv = np.load(os.path.join(cache_dir, 'ohlcv.npy'), mmap_mode='r')
+
+    def _cache_valid(self):
+        meta_path = os.path.join(self.cache_dir, 'meta.json')
+        if not os.path.exists(meta_path):
+            return False
+        with open(meta_path) as f:
+            meta = json.load(f)
+        sources = meta.get('sources', {})
+        changed = False
+        for path in (self.close_csv, self.ohlcv_csv):
+            old = sources.get(path)
+            if old is None:
+                return False
+            new = _fingerprint(path, with_hash=False)
+            if new['size'] != old['size']:
+                return False
+            if new['mtime'] != old['mtime']:
+                # touched but maybe not modified, compare contents
+                new = _fingerprint(path)
+                if new['sha1'] != old['sha1']:
+                    return False
+                sources[path] = new
+                changed = True
+        if changed:
+            # workers may be reading meta.json right now
+            self._write_meta(meta)
+        return True
+
+    def _write_meta(self, meta):
+        """Writes meta.json to a temp name and renames it, so readers never see half a file"""
+        tmp = os.path.join(self.cache_dir, f'meta.{os.getpid()}.tmp.json')
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(self.cache_dir, 'meta.json'))
+
+    def _build(self):
+        close = pd.read_csv(self.close_csv).sort_values('Date')
+        tickers = [c for c in close.columns if c != 'Date']
+        dates = close['Date'].to_numpy(dtype=str)
+
+        long = pd.read_csv(self.ohlcv_csv)
+        ohlcv = np.full((len(dates), len(tickers), len(FIELDS)), np.nan)
+        day = pd.Index(dates).get_indexer(long['Date'])
+        tick = pd.Index(tickers).get_indexer(long['Ticker'])
+        keep = (day >= 0) & (tick >= 0)
+        ohlcv[day[keep], tick[keep]] = long.loc[keep, FIELDS].to_numpy(dtype=float)
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # write to temp names and rename so a concurrent reader never sees half a cache
+        arrays = {'dates': dates,
+                  'close': close[tickers].to_numpy(dtype=float),
+                  'ohlcv': ohlcv}
+        for name, array in arrays.items():
+            tmp = os.path.join(self.cache_dir, f'{name}.{os.getpid()}.tmp.npy')
+            np.save(tmp, array)
+            os.replace(tmp, os.path.join(self.cache_dir, f'{name}.npy'))
+        meta = {'tickers': tickers,
+                'fields': FIELDS,
+                'sources': {path: _fingerprint(path) for path in (self.close_csv, self.ohlcv_csv)}}
+        self._write_meta(meta)
+
+    def close_frame(self):
+        """Date x ticker closing prices as a DataFrame over the memory-mapped array (same shape as load_prices)"""
+        if self._close_frame is None:
+            frame = pd.DataFrame(self.close, index=pd.Index(self.dates, name='Date'),
+                                 columns=self.tickers, copy=False)
+            self._close_frame = frame
+        return self._close_frame
+
+    def field(self, name):
+        """days x tickers view of one OHLCV field"""
+        return self.ohlcv[:, :, self.fields.index(name)]
+
+    def ohlcv_index(self):
+        """OHLCVIndex over the memory-mapped OHLCV array (no copy)"""
+        return OHLCVIndex(self.dates, self.tickers, self.ohlcv, self.fields)
+
+
+class OHLCVIndex:
+    def __init__(self, dates, tickers, ohlcv, fields=FIELDS):
+        """
+        Args:
+            dates (array-like): one per row of ohlcv
+            tickers (list): one per column of ohlcv
+            ohlcv (np.ndarray): days x tickers x fields bars, NaN where missing
+            fields (list): field order of the last axis
+        """
+        self.dates = np.asarray(dates)
+        self.tickers = list(tickers)
+        self.fields = list(fields)
+        self.ohlcv = ohlcv
+        self.rows = {str(d): i for i, d in enumerate(self.dates)}
+        self.columns = {t: j for j, t in enumerate(self.tickers)}
+
+    @classmethod
+    def from_long(cls, frame, fields=FIELDS):
+        """Pivots a long Date, Ticker, <fields> table (ex. Data/clean_stock_data.csv) once"""
+        dates = np.sort(frame['Date'].astype(str).unique())
+        tickers = list(pd.unique(frame['Ticker']))
+        ohlcv = np.full((len(dates), len(tickers), len(fields)), np.nan)
+        day = pd.Index(dates).get_indexer(frame['Date'].astype(str))
+        tick = pd.Index(tickers).get_indexer(frame['Ticker'])
+        ohlcv[day, tick] = frame[fields].to_numpy(dtype=float)
+        return cls(dates, tickers, ohlcv, fields)
+
+    def bar(self, date, ticker):
+        """{field: value} of one (date, ticker) bar"""
+        return dict(zip(self.fields, self.ohlcv[self.rows[date], self.columns[ticker]].tolist()))
+
+    def column_ids(self, tickers):
+        """Column of every ticker, -1 for tickers not in the index"""
+        return np.array([self.columns.get(t, -1) for t in tickers], dtype=np.intp)
+
+    def bars(self, date, columns):
+        """
+        len(columns) x fields bars of one date (rows of NaN for a missing date or column -1)
+        """
+        row = self.rows.get(date)
+        out = np.full((len(columns), len(self.fields)), np.nan)
+        if row is not None:
+            known = columns >= 0
+            out[known] = self.ohlcv[row, columns[known]]
+        return out
+
+
+def get_store(close_csv=CLOSE_CSV, ohlcv_csv=OHLCV_CSV, cache_dir=CACHE_DIR):
+    """Returns the process-wide MarketData for these files, loading it on first use"""
+    key = (close_csv, ohlcv_csv, cache_dir)
+    if key not in _stores:
+        _stores[key] = MarketData(close_csv, ohlcv_csv, cache_dir)
+    return _stores[key]
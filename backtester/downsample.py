@@ -0,0 +1,186 @@
+import numpy as np
+
+"""
+Shape-preserving downsampling for charts
+    1) lttb ~ Largest-Triangle-Three-Buckets: keeps the first and last points
+              and, per bucket, the point spanning the largest triangle with
+              the previous kept point and the next bucket's average, so peaks
+              and troughs survive
+    2) ohlc_bars ~ merges runs of consecutive candles into one (first open,
+                   highest high, lowest low, last close)
+    3) minmax ~ the lowest and highest point of every bucket, vectorized
+    4) LineLevels / CandleLevels ~ a pyramid of coarser and coarser levels of
+                                   one series, built once (minmax for lines,
+                                   ohlc_bars for candles); view(start, stop)
+                                   draws the visible range from the finest
+                                   level small enough (then lttb for lines),
+                                   so a zoom costs about points * factor work
+                                   however long the series is
+
+Ranges are positions in the full series (start inclusive, stop exclusive).
+Nothing here depends on plotly: views are dicts of trace properties
+(x / y, or x / open / high / low / close).
+"""
+
+POINTS = 2000
+FACTOR = 4
+# minmax keeps first / last / min / max, so no level gets below this
+MIN_POINTS = 4
+
+
+def check_levels(points, factor=FACTOR):
+    """Raises ValueError for points / factor a level pyramid can't be built with"""
+    if points < MIN_POINTS:
+        raise ValueError(f"points must be at least {MIN_POINTS}, got {points}")
+    if factor < 2:
+        raise ValueError(f"factor must be at least 2, got {factor}")
+
+
+def lttb(y, n, x=None):
+    """
+    Positions of the n points LTTB keeps
+
+    Args:
+        y (np.ndarray): values
+        n (int): points to keep (all of them when n >= len(y))
+        x (np.ndarray): x coordinates, evenly spaced when None
+    """
+    size = len(y)
+    if n >= size:
+        return np.arange(size)
+    if n < 3:
+        return np.array([0, size - 1][:max(n, 0)], dtype=np.intp)
+    y = np.asarray(y, dtype=float)
+    x = np.arange(size, dtype=float) if x is None else np.asarray(x, dtype=float)
+    # n - 2 buckets between the first and last point
+    edges = np.linspace(1, size - 1, n - 1).astype(np.intp)
+    sums_x = np.add.reduceat(x[1:size - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1:size - 1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    # the bucket after the last one is the final point
+    next_x = np.append(sums_x[1:] / counts[1:], x[-1])
+    next_y = np.append(sums_y[1:] / counts[1:], y[-1])
+
+    keep = np.empty(n, dtype=np.intp)
+    keep[0], keep[-1] = 0, size - 1
+    a = 0
+    for i in range(n - 2):
+        lo, hi = edges[i], edges[i + 1]
+        xa, ya = x[a], y[a]
+        area = np.abs((xa - next_x[i]) * (y[lo:hi] - ya) - (xa - x[lo:hi]) * (next_y[i] - ya))
+        a = lo + int(np.nanargmax(area)) if not np.isnan(area).all() else lo
+        keep[i + 1] = a
+    return keep
+
+
+def minmax(y, size):
+    """
+    Positions of the lowest and highest value of every size-point bucket
+    (plus the first and last point), sorted
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    full = n // size * size
+    blocks = y[:full].reshape(-1, size)
+    base = np.arange(0, full, size)
+    low = base + np.argmin(np.where(np.isnan(blocks), np.inf, blocks), axis=1)
+    high = base + np.argmax(np.where(np.isnan(blocks), -np.inf, blocks), axis=1)
+    parts = [[0], low, high, [n - 1]]
+    if full < n:
+        tail = y[full:]
+        parts.append(full + np.array([np.argmin(np.where(np.isnan(tail), np.inf, tail)),
+                                      np.argmax(np.where(np.isnan(tail), -np.inf, tail))]))
+    return np.unique(np.concatenate(parts).astype(np.intp))
+
+
+def ohlc_bars(opens, highs, lows, closes, starts):
+    """
+    Candles merged from starts[i] up to starts[i + 1] (the last one to the end)
+
+    Returns:
+        (opens, highs, lows, closes) of the merged candles
+    """
+    ends = np.append(starts[1:], len(closes)) - 1
+    return (opens[starts], np.fmax.reduceat(highs, starts), np.fmin.reduceat(lows, starts), closes[ends])
+
+
+class LineLevels:
+    def __init__(self, x, y, points=POINTS, factor=FACTOR):
+        """
+        Args:
+            x (array-like): labels drawn on the x axis (ex. dates), sorted
+            y (array-like): values
+            points (int): the coarsest level has at most this many points
+            factor (int): each level keeps 1 / factor of the previous one
+        """
+        check_levels(points, factor)
+        self.x = np.asarray(x)
+        self.y = np.asarray(y, dtype=float)
+        self.factor = factor
+        self.levels = [np.arange(len(self.y))]
+        # min and max of every 2 * factor points: 1 / factor of the points each level
+        while len(self.levels[-1]) > points:
+            finer = self.levels[-1]
+            coarser = finer[minmax(self.y[finer], 2 * factor)]
+            if len(coarser) >= len(finer):
+                break
+            self.levels.append(coarser)
+
+    def __len__(self):
+        return len(self.y)
+
+    def view(self, start=None, stop=None, points=POINTS):
+        """{'x', 'y'} of at most points points between positions start and stop"""
+        check_levels(points, self.factor)
+        start = 0 if start is None else max(int(start), 0)
+        stop = len(self.y) if stop is None else min(int(stop), len(self.y))
+        for positions in self.levels:
+            lo, hi = np.searchsorted(positions, [start, stop])
+            if hi - lo <= points * self.factor:
+                break
+        positions = positions[lo:hi]
+        positions = positions[lttb(self.y[positions], points, x=positions)]
+        return {'x': self.x[positions], 'y': self.y[positions]}
+
+
+class CandleLevels:
+    def __init__(self, x, opens, highs, lows, closes, points=POINTS, factor=FACTOR):
+        """
+        Args:
+            x (array-like): labels drawn on the x axis (ex. dates), sorted
+            opens, highs, lows, closes (array-like): one candle per x
+            points, factor: see LineLevels
+        """
+        check_levels(points, factor)
+        self.x = np.asarray(x)
+        self.factor = factor
+        bars = tuple(np.asarray(a, dtype=float) for a in (opens, highs, lows, closes))
+        # each level: position of every candle's first bar, and the candles
+        self.levels = [(np.arange(len(self.x)), bars)]
+        while len(self.levels[-1][0]) > points:
+            firsts, finer = self.levels[-1]
+            starts = np.arange(0, len(firsts), factor)
+            if len(starts) >= len(firsts):
+                break
+            self.levels.append((firsts[starts], ohlc_bars(*finer, starts)))
+
+    def __len__(self):
+        return len(self.x)
+
+    def view(self, start=None, stop=None, points=POINTS):
+        """{'x', 'open', 'high', 'low', 'close'} of at most points candles between positions start and stop"""
+        check_levels(points, self.factor)
+        start = 0 if start is None else max(int(start), 0)
+        stop = len(self.x) if stop is None else min(int(stop), len(self.x))
+        for firsts, bars in self.levels:
+            # candles overlapping the range
+            lo = max(np.searchsorted(firsts, start, side='right') - 1, 0)
+            hi = np.searchsorted(firsts, stop)
+            if hi - lo <= points * self.factor:
+                break
+        firsts = firsts[lo:hi]
+        bars = tuple(a[lo:hi] for a in bars)
+        if len(firsts) > points:
+            starts = np.arange(0, len(firsts), -(-len(firsts) // points))
+            firsts, bars = firsts[starts], ohlc_bars(*bars, starts)
+        return dict(zip(('x', 'open', 'high', 'low', 'close'), (self.x[firsts],) + bars))
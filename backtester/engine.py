@@ -1,9 +1,17 @@
+import collections
+import os
+import pickle
+import time
+
+import numpy as np
 import pandas as pd
+from backtester.datastore import get_store
+from backtester.feed import FrameFeed
+from backtester.metrics import batch_metrics
 from backtester.portfolio import Portfolio
+from backtester.records import Signal, column
 from backtester.strategies import TrendFollowing
 
-tickers = ['AAPL', 'JNJ', 'SPY']
-
 """
 Backtesting engine returns:
     1) Equity curve
@@ -11,56 +19,449 @@ Backtesting engine returns:
     3) Final portfolio state
 """
 
+def load_prices(path="Data/date_close_data.csv"):
+    """Reads the Date x ticker closing price table, indexed by Date"""
+    data = pd.read_csv(path)
+    data.set_index("Date", inplace=True)
+    return data
+
+
 class BTE:
-    def __init__(self, portfolio: Portfolio, strategy: TrendFollowing):
+    def __init__(self, portfolio: Portfolio, strategy: TrendFollowing, data=None, instrument=None,
+                 orders=None, ohlcv=None):
+        """
+        Args:
+            portfolio (Portfolio): portfolio to trade
+            strategy: strategy generating signals
+            data (pd.DataFrame): preloaded closing prices (see load_prices),
+                                 taken from the shared market data cache when not given.
+                                 Can also be a bar feed (see backtester.feed) to stream
+                                 the history in chunks instead of holding it in memory
+            instrument (Instrumentation): per-stage timers, counters, hooks and
+                                          profiling (see backtester.instrument), off when None
+            orders (OrderBook): intrabar stop / limit / stop-loss orders filled against each
+                                bar's Open/High/Low (see backtester.orders), close-only when None.
+                                With an instrument too, the sweep is timed with the 'orders' stage
+            ohlcv (OHLCVIndex): bars the orders fill against, the market data cache when not given
+        """
         self.portfolio = portfolio
         self.strategy = strategy
-        self.data = pd.read_csv("Data/date_close_data.csv")
-        self.alldata = pd.read_csv("Data/clean_stock_data.csv")
-        self.data.set_index("Date", inplace=True)
+        # whole-bar strategies (process_bar) skip the per-ticker loop
+        self.cross_sectional = hasattr(strategy, 'process_bar')
+        self.instrument = instrument
+        self.orders = orders
+        self._ohlcv = ohlcv
+        self._ohlcv_columns = None
+        if data is None:
+            data = get_store().close_frame()
+        if isinstance(data, pd.DataFrame):
+            self.feed = FrameFeed(data)
+            self.data = self.feed.data
+        else:
+            self.data = None
+            self.feed = data
+        self._alldata = None
+        # how the portfolio's run began: {'start_date', 'warmup' (bars), 'vectorized'},
+        # None before the first run (see _origin)
+        self.origin = None
+
+        # universe comes from the data columns, registered with the portfolio
+        self.tickers = list(self.feed.tickers)
+        self.columns = {ticker: j for j, ticker in enumerate(self.tickers)}
+        self.ticker_ids = np.array(self.portfolio.add_tickers(self.tickers), dtype=int)
+        self.aligned = self.ticker_ids.tolist() == list(range(len(self.portfolio.tickers)))
+
+    def marks(self, prices):
+        """
+        Spreads closing prices (data column order) over the portfolio universe
 
-    def run_backtest(self, start_date=None, end_date=None):
+        Tickers the portfolio holds that the data does not price are marked at 0
+        """
+        if self.aligned and len(self.portfolio.tickers) == len(self.tickers):
+            return prices
+        full = np.zeros(prices.shape[:-1] + (len(self.portfolio.tickers),))
+        full[..., self.ticker_ids] = prices
+        return full
+
+    @property
+    def last_date(self):
+        """Date of the last bar recorded, None before the first bar"""
+        labels = self.portfolio.ledger.labels
+        if not labels or labels[-1] == 'START':
+            return None
+        return labels[-1]
+
+    def save_checkpoint(self, path):
+        """
+        Snapshots the portfolio (cash, positions, open positions, trade lists,
+        equity ledger), the strategy (ticker_state, indicators) and how the
+        run began (origin) to path
+        """
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump({'portfolio': self.portfolio, 'strategy': self.strategy, 'origin': self.origin}, f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def from_checkpoint(cls, path, data=None):
+        """
+        Restores an engine saved with save_checkpoint
+
+        run_backtest / run_vectorized on the restored engine only process
+        bars after last_date, so new days are appended to the saved run
+        """
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        engine = cls(state['portfolio'], state['strategy'], data=data)
+        engine.origin = state.get('origin')
+        return engine
+
+    def _origin(self):
+        """origin of a resumed run, from the ledger's first bar when it wasn't recorded"""
+        if self.origin is not None:
+            return self.origin
+        labels = self.portfolio.ledger.labels
+        if self.portfolio.metrics is not None or len(labels) < 2:
+            raise ValueError("can't tell where this run began, rerun it from the start")
+        return {'start_date': labels[1], 'warmup': 0, 'vectorized': False}
+
+    @property
+    def ohlcv(self):
+        """OHLCVIndex the order book fills against"""
+        if self._ohlcv is None:
+            self._ohlcv = get_store().ohlcv_index()
+        return self._ohlcv
+
+    @property
+    def alldata(self):
+        """Long format OHLCV table, only read when asked for"""
+        if self._alldata is None:
+            self._alldata = pd.read_csv("Data/clean_stock_data.csv")
+        return self._alldata
+
+    def warm_up(self, start_date, bars=None):
+        """
+        Shows the strategy the bars before start_date without trading: its
+        indicators fill up, the orders it would have sent are dropped and
+        every ticker is left flat (strategy.flatten), so the run can signal
+        from its first bar instead of waiting for a full window
+
+        Args:
+            start_date (str): first bar of the run
+            bars (int): how many of the bars before start_date, all of them when None
+
+        Returns:
+            int: bars shown
+        """
+        if not start_date or bars == 0:
+            return 0
+        if self.last_date is not None:
+            raise ValueError("warm up an engine before its first bar, not a resumed run")
+        rows = collections.deque(maxlen=bars)
+        for dates, prices in self.feed.chunks(end_date=start_date):
+            rows.extend(row for date, row in zip(dates, prices) if date < start_date)
+        for row in rows:
+            self._prime(row)
+        self.strategy.flatten()
+        return len(rows)
+
+    def _prime(self, row):
+        """Feeds one bar to the strategy and drops its orders"""
+        if self.cross_sectional:
+            self.strategy.process_bar(row)
+        else:
+            for ticker, close_price in zip(self.tickers, row):
+                self.strategy.process_day(ticker, close_price)
+            self.strategy.signals = []
+
+    def run_backtest(self, start_date=None, end_date=None, warmup=0):
         """
         Main simulation loop
         Per time step:
             1) gets the current prices
-            2) Calls strategy to generate signals
+            2) Calls strategy to generate signals (process_bar with the whole
+               bar when the strategy has it, else process_day per ticker)
             3) Executes trades based on signals
                 if signal = buy (portfolio.buy)
                 if signal = sell (portfolio.sell)
             4) Update portfolio value 
             5) Record equity
         Repeats for all time steps 
+
+        Bars are pulled from self.feed one chunk at a time, only rows between
+        start_date and end_date are read. Bars up to last_date have already
+        been processed (earlier call or restored checkpoint) and are skipped
+
+        warmup bars before start_date (all of them when None) go through
+        warm_up first, 0 starts the strategy cold
         """
-        if self.portfolio.equity_curve.empty:
+        if self.last_date is None:
+            self.origin = {'start_date': start_date, 'warmup': self.warm_up(start_date, warmup) if warmup != 0 else 0,
+                           'vectorized': False}
+        elif warmup != 0:
+            raise ValueError("warm up an engine before its first bar, not a resumed run")
+        elif self._origin()['vectorized']:
+            raise ValueError("run_vectorized doesn't keep the strategy's state, resume this run with run_vectorized")
+        if len(self.portfolio.ledger) == 0:
             self.portfolio.record_equity(date='START')
 
-            data_subset = self.data.copy()
-            if start_date:
-                data_subset = data_subset[data_subset.index >= start_date]
-            if end_date:
-                data_subset = data_subset[data_subset.index <= end_date]
+        if self.instrument is None:
+            for dates, prices in self.feed.chunks(start_date, end_date, after=self.last_date):
+                for date, row in zip(dates, prices):
+                    self.step(date, row)
+        else:
+            self.instrument.start()
+            try:
+                for dates, prices in self.feed.chunks(start_date, end_date, after=self.last_date):
+                    for date, row in zip(dates, prices):
+                        self._step_instrumented(date, row)
+            finally:
+                self.instrument.stop()
+        
+        performance = self.build_results()
+        return performance
+
+    def step(self, date, row):
+        """
+        Processes one bar: strategy signals, fills, mark to market, equity snapshot
+
+        Args:
+            date (str): bar date
+            row (np.ndarray): closing prices in self.tickers order
+        """
+        if self.instrument is not None:
+            return self._step_instrumented(date, row)
+        if self.orders is not None:
+            return self._step_orders(date, row)
+        if self.cross_sectional:
+            ticker_ids, sides, quantities = self.strategy.process_bar(row)
+            for j, side, quantity in zip(ticker_ids.tolist(), sides.tolist(), quantities.tolist()):
+                if side > 0:
+                    self.portfolio.buy(self.tickers[j], quantity, row[j], date)
+                else:
+                    self.portfolio.sell(self.tickers[j], quantity, row[j], date)
+            self.portfolio.update(self.marks(row))
+            self.portfolio.record_equity(date)
+            return
+        for ticker, close_price in zip(self.tickers, row):
+            self.strategy.process_day(ticker, close_price)
+        signals = self.strategy.signals
+        for signal in signals:
+            action = signal["action"]
+            ticker = signal["ticker"]
+            quantity = signal["quantity"]
+            price = row[self.columns[ticker]]
+
+            if action == "BUY":
+                self.portfolio.buy(ticker, quantity, price, date)
+            elif action == "SELL":
+                self.portfolio.sell(ticker, quantity, price, date)
+        self.portfolio.update(self.marks(row))
+        self.portfolio.record_equity(date)  
+        self.strategy.signals = []  
+
+    def fill(self, j, side, quantity, price, date):
+        """
+        Trades one order through the portfolio, telling the order book about fills
+
+        Args:
+            j (int): ticker column in the data
+            side (int): 1 = BUY, -1 = SELL
+            quantity (float): shares
+            price (float): fill price
+            date (str): bar date
+
+        Returns:
+            bool: True if the portfolio accepted the trade
+        """
+        if side > 0:
+            filled = self.portfolio.buy(self.tickers[j], quantity, price, date)
+        else:
+            filled = self.portfolio.sell(self.tickers[j], quantity, price, date)
+        if filled and self.orders is not None:
+            self.orders.on_fill(self, j, side, quantity, price)
+        return filled
+
+    def _sweep(self, date):
+        """Fills the order book's triggered orders, returns (filled, triggered)"""
+        if self._ohlcv_columns is None:
+            self._ohlcv_columns = self.ohlcv.column_ids(self.tickers)
+        return self.orders.sweep(self, date, self.ohlcv.bars(date, self._ohlcv_columns))
 
+    def _step_orders(self, date, row):
+        """step with an order book: pending orders fill intrabar, then the close signals"""
+        self._sweep(date)
+        if self.cross_sectional:
+            ticker_ids, sides, quantities = self.strategy.process_bar(row)
+            for j, side, quantity in zip(ticker_ids.tolist(), sides.tolist(), quantities.tolist()):
+                self.fill(j, side, quantity, row[j], date)
+        else:
+            for ticker, close_price in zip(self.tickers, row):
+                self.strategy.process_day(ticker, close_price)
+            for signal in self.strategy.signals:
+                j = self.columns[signal["ticker"]]
+                self.fill(j, 1 if signal["action"] == "BUY" else -1, signal["quantity"], row[j], date)
+        self.portfolio.update(self.marks(row))
+        self.portfolio.record_equity(date)
+        self.strategy.signals = []
+
+    def _step_instrumented(self, date, row):
+        """step with per-stage timers, counters and hooks"""
+        inst = self.instrument
+        hooks = inst.hooks
+        # intrabar orders fill before the strategy sees the close
+        swept = triggered = 0
+        s0 = time.perf_counter()
+        if self.orders is not None:
+            swept, triggered = self._sweep(date)
+        s1 = time.perf_counter()
 
-        for date, row in data_subset.iterrows():
-            for ticker in tickers:
-                close_price = row[ticker]
+        t0 = time.perf_counter()
+        if self.cross_sectional:
+            ticker_ids, sides, quantities = self.strategy.process_bar(row)
+            signals = [Signal(self.tickers[j], "BUY" if side > 0 else "SELL", quantity)
+                       for j, side, quantity in zip(ticker_ids.tolist(), sides.tolist(), quantities.tolist())]
+        else:
+            for ticker, close_price in zip(self.tickers, row):
                 self.strategy.process_day(ticker, close_price)
             signals = self.strategy.signals
-            for signal in signals:
-                action = signal["action"]
-                ticker = signal["ticker"]
-                quantity = signal["quantity"]
-                price = row[ticker]
-
-                if action == "BUY":
-                    self.portfolio.buy(ticker, quantity, price, date)
-                elif action == "SELL":
-                    self.portfolio.sell(ticker, quantity, price, date)
-            self.portfolio.update(row)
-            self.portfolio.record_equity(date)  
-            self.strategy.signals = []  
-        
+        t1 = time.perf_counter()
+        for hook in hooks['signals']:
+            hook(self, date, signals=signals)
+
+        t2 = time.perf_counter()
+        fills = 0
+        for signal in signals:
+            j = self.columns[signal["ticker"]]
+            fills += bool(self.fill(j, 1 if signal["action"] == "BUY" else -1, signal["quantity"], row[j], date))
+        t3 = time.perf_counter()
+        fills += swept
+        rejected = len(signals) + triggered - fills
+        for hook in hooks['orders']:
+            hook(self, date, fills=fills, rejected=rejected)
+
+        t4 = time.perf_counter()
+        self.portfolio.update(self.marks(row))
+        t5 = time.perf_counter()
+        for hook in hooks['mark']:
+            hook(self, date, value=self.portfolio.portfolio_value)
+
+        t6 = time.perf_counter()
+        self.portfolio.record_equity(date)  
+        t7 = time.perf_counter()
+        for hook in hooks['record']:
+            hook(self, date)
+        self.strategy.signals = []  
+
+        timers = inst.timers
+        timers['signals'] += t1 - t0
+        timers['orders'] += t3 - t2 + s1 - s0
+        timers['mark'] += t5 - t4
+        timers['record'] += t7 - t6
+        counters = inst.counters
+        counters['bars'] += 1
+        counters['signals'] += len(signals)
+        counters['orders'] += triggered
+        counters['fills'] += fills
+        counters['rejected'] += rejected
+        for hook in hooks['bar']:
+            hook(self, date)
+
+    def run_vectorized(self, start_date=None, end_date=None, warmup=0):
+        """
+        Whole-history version of run_backtest
+            1) Strategy builds its full signal matrix in one pass (strategy.signal_matrix)
+            2) Signals are filled in date/ticker order through portfolio.buy/sell,
+               so rejected orders and closed trades match the event loop
+            3) Positions, cash and portfolio value are marked to market for
+               every day at once and written to the ledger in one block
+        Produces the same equity curve and closed_trades as run_backtest
+        Needs the whole history in memory, so not available for streamed feeds
+        With an instrument attached the four stages are timed as a whole
+        (per-bar hooks are not called)
+        warmup bars before start_date (all of them when None) are passed to
+        strategy.signal_matrix as history only, like run_backtest's warm_up
+        Bars up to last_date are skipped like in run_backtest: the signals are
+        rebuilt from the first bar of the run (and its warm-up), so a resumed
+        run gets the signals one uninterrupted run would have
+        """
+        if self.data is None:
+            raise ValueError("run_vectorized needs a DataFrame, not a streaming feed")
+        if self.orders is not None:
+            raise ValueError("run_vectorized fills at the close only, use run_backtest with an order book")
+        resume = self.last_date
+        if resume is None:
+            first, last = self.feed.bounds(start_date, end_date)
+            lead = first if warmup is None else min(warmup, first)
+            begin = first
+            self.origin = {'start_date': start_date, 'warmup': lead, 'vectorized': True}
+        else:
+            if warmup != 0:
+                raise ValueError("warm up an engine before its first bar, not a resumed run")
+            origin = self._origin()
+            begin, last = self.feed.bounds(start_date, end_date, after=resume)
+            first = min(self.feed.bounds(origin['start_date'])[0], begin)
+            lead = min(origin['warmup'], first)
+
+        inst = self.instrument
+        if inst is not None:
+            inst.start()
+            t0 = time.perf_counter()
+        dates = self.feed.dates[begin:last].tolist()
+        prices = self.feed.prices[begin:last]
+        history = self.feed.prices[first - lead:last]
+        if lead:
+            signals = self.strategy.signal_matrix(history, warmup=lead)
+        else:
+            signals = self.strategy.signal_matrix(history)
+        signals = signals[begin - first:]
+        quantity = self.strategy.position_size
+        if inst is not None:
+            t1 = time.perf_counter()
+
+        if len(self.portfolio.ledger) == 0:
+            self.portfolio.record_equity(date='START')
+        start_cash = self.portfolio.cash
+        start_positions = self.portfolio.shares.copy()
+
+        fills = np.zeros((len(prices), len(start_positions)))
+        cash = np.full(len(prices), np.nan)
+        n_signals = n_fills = 0
+        for t, j in zip(*np.nonzero(signals)):
+            ticker = self.tickers[j]
+            if signals[t, j] > 0:
+                filled = self.portfolio.buy(ticker, quantity, prices[t, j], dates[t])
+            else:
+                filled = self.portfolio.sell(ticker, quantity, prices[t, j], dates[t])
+            n_signals += 1
+            if filled:
+                n_fills += 1
+                fills[t, self.ticker_ids[j]] += signals[t, j] * quantity
+                cash[t] = self.portfolio.cash
+        if inst is not None:
+            t2 = time.perf_counter()
+
+        positions = start_positions + np.cumsum(fills, axis=0)
+        cash = pd.Series(cash).ffill().fillna(start_cash).to_numpy()
+        value = cash + (positions * self.marks(prices)).sum(axis=1)
+        if inst is not None:
+            t3 = time.perf_counter()
+
+        self.portfolio.ledger.extend(dates, cash, value, positions)
+        if len(dates):
+            self.portfolio.portfolio_value = value[-1]
+
+        if inst is not None:
+            inst.timers['signals'] += t1 - t0
+            inst.timers['orders'] += t2 - t1
+            inst.timers['mark'] += t3 - t2
+            inst.timers['record'] += time.perf_counter() - t3
+            inst.counters['bars'] += len(dates)
+            inst.counters['signals'] += n_signals
+            inst.counters['fills'] += n_fills
+            inst.counters['rejected'] += n_signals - n_fills
+            inst.stop()
+
         performance = self.build_results()
         return performance
 
@@ -74,55 +475,30 @@ class BTE:
         - Average gain/loss
         - Sharpe/Sortino
         - Exposure & Turnover
-        """
-        equity = performance["Portfolio_value"]
-        returns = performance["Daily_Return"].dropna()   
-        trades = pd.DataFrame(self.portfolio.closed_trades)
 
-        #sharpe     
-        sharpe = returns.mean() / returns.std() * (252 ** 0.5)
-        
-        #Win rate
-        if len(trades) > 0:
-            win_rate = (trades["pnl"] > 0).mean()
-        #avg gain/loss
-            avg_gain = trades[trades["pnl"] > 0]["pnl"].mean()
-            avg_loss = trades[trades["pnl"] < 0]["pnl"].mean()
-        else:
-            win_rate = 0
-            avg_gain = 0
-            avg_loss = 0
+        (one run through metrics.batch_metrics, see there for many runs at once)
 
-        #total return
-        tot_return = equity.iloc[-1] / equity.iloc[0] - 1
-
-        #max drawdown
-        max_drawdown = performance["Drawdown"].min()
-
-        #sortino
-        downside = returns[returns < 0]
-        sortino = returns.mean() / downside.std() * (252 ** 0.5)
+        Without history (Portfolio(history=False)) the metrics come from the
+        portfolio's online metrics and performance is not needed
+        """
+        if self.portfolio.metrics is not None:
+            return self.portfolio.metrics.result()
+        trades = pd.DataFrame({'run_id': 0, 'pnl': column(self.portfolio.closed_trades, 'pnl')})
+        invested = performance[self.portfolio.tickers].to_numpy().sum(axis=1)
+        stats = batch_metrics(performance["Portfolio_value"].to_numpy()[None], trades, invested[None])
+        return stats.iloc[0].to_dict()
 
-        #exposure
-        exposure = (performance[tickers].sum(axis=1) > 0).mean()
-        
-        return {
-            "Total Return": tot_return,
-            "Sharpe": sharpe,
-            "Sortino": sortino,
-            "Max Drawdown": max_drawdown,
-            "Win Rate": win_rate,
-            "Average Gain": avg_gain,
-            "Average Loss": avg_loss,
-            "Exposure": exposure
-        }
-    
     def build_results(self):
-        print(self.portfolio.equity_curve.head())
-        print(self.portfolio.equity_curve.columns)
         equity = self.portfolio.equity_curve.copy()
         if 'Portfolio_value' not in equity.columns:
             raise KeyError()
+        metrics = self.portfolio.metrics
+        if metrics is not None:
+            # no history: the latest row, with its running max and drawdown
+            equity["Daily_Return"] = np.nan
+            equity["Rolling_Max"] = metrics.peak
+            equity["Drawdown"] = metrics.drawdown
+            return equity
         equity["Daily_Return"] = equity["Portfolio_value"].pct_change()
         equity["Rolling_Max"] = equity["Portfolio_value"].cummax()
         equity["Drawdown"] = (equity["Portfolio_value"]- equity["Rolling_Max"])/equity["Rolling_Max"]
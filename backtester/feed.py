@@ -0,0 +1,142 @@
+import numpy as np
+import pandas as pd
+
+from backtester.datastore import get_store
+
+"""
+Bar feeds for BTE.run_backtest
+    1) FrameFeed ~ a Date x ticker DataFrame already in memory
+    2) CSVFeed ~ a Date x ticker CSV (ex. Data/date_close_data.csv) read chunksize rows at a time
+    3) CacheFeed ~ the memory-mapped market data cache (datastore.MarketData)
+    4) ArrayFeed ~ a dates array plus a price matrix (or a view of one, ex. a
+                   slice of tickers in shared memory), chunks are views, never copies
+
+Every feed has a tickers list and chunks(start_date, end_date, after), which
+yields (dates, prices) pairs: a list of date strings and a len(dates) x tickers
+array of closing prices. Only rows inside the date range (and strictly later
+than after, used to resume from a checkpoint) are yielded, and
+the engine only ever holds one chunk, so memory depends on chunksize rather
+than on the length of the history. Dates must be sorted ascending.
+
+Feeds over data already in memory (FrameFeed, CacheFeed, ArrayFeed) find a
+date range with two binary searches over the sorted dates (date_bounds), so
+picking a period costs O(log n) instead of comparing every date.
+"""
+
+
+def date_bounds(dates, start_date=None, end_date=None, after=None):
+    """
+    [first, last) rows of sorted dates inside the range
+
+    Args:
+        dates: sorted dates (np.ndarray or pd.Index)
+        start_date (str): first date kept, from the first row when None
+        end_date (str): last date kept, to the last row when None
+        after (str): only dates strictly later than this one
+    """
+    first = np.searchsorted(dates, start_date, side='left') if start_date else 0
+    if after:
+        first = max(first, np.searchsorted(dates, after, side='right'))
+    last = np.searchsorted(dates, end_date, side='right') if end_date else len(dates)
+    return int(first), int(max(last, first))
+
+
+class FrameFeed:
+    def __init__(self, data, chunksize=None):
+        """
+        Args:
+            data (pd.DataFrame): Date indexed closing prices, one column per ticker
+                                 (sorted by date once here if it is not already)
+            chunksize (int): rows per chunk, whole range in one chunk when None
+        """
+        if not data.index.is_monotonic_increasing:
+            data = data.sort_index()
+        self.data = data
+        self.tickers = list(data.columns)
+        self.chunksize = chunksize
+        # read once: every period is a slice of these (views, never copies)
+        self.dates = data.index
+        self.prices = data.to_numpy(dtype=float)
+
+    def bounds(self, start_date=None, end_date=None, after=None):
+        """[first, last) rows of the date range, see date_bounds"""
+        return date_bounds(self.dates, start_date, end_date, after)
+
+    def chunks(self, start_date=None, end_date=None, after=None):
+        first, last = self.bounds(start_date, end_date, after)
+        step = self.chunksize or max(last - first, 1)
+        for i in range(first, last, step):
+            j = min(i + step, last)
+            yield self.dates[i:j].tolist(), self.prices[i:j]
+
+
+class CSVFeed:
+    def __init__(self, path="Data/date_close_data.csv", chunksize=10000):
+        """
+        Args:
+            path (str): CSV with a Date column followed by one close column per ticker
+            chunksize (int): rows parsed per chunk
+        """
+        self.path = path
+        self.chunksize = chunksize
+        self.tickers = [c for c in pd.read_csv(path, nrows=0).columns if c != 'Date']
+
+    def chunks(self, start_date=None, end_date=None, after=None):
+        for chunk in pd.read_csv(self.path, chunksize=self.chunksize):
+            dates = chunk['Date']
+            if start_date and dates.iloc[-1] < start_date:
+                continue
+            if after and dates.iloc[-1] <= after:
+                continue
+            if end_date and dates.iloc[0] > end_date:
+                break
+            keep = np.ones(len(chunk), dtype=bool)
+            if start_date:
+                keep &= (dates >= start_date).to_numpy()
+            if end_date:
+                keep &= (dates <= end_date).to_numpy()
+            if after:
+                keep &= (dates > after).to_numpy()
+            yield dates[keep].tolist(), chunk.loc[keep, self.tickers].to_numpy(dtype=float)
+
+
+class CacheFeed:
+    def __init__(self, store=None, chunksize=10000):
+        """
+        Args:
+            store (MarketData): market data cache, the shared one when not given
+            chunksize (int): rows copied out of the memory map per chunk
+        """
+        self.store = store if store is not None else get_store()
+        self.chunksize = chunksize
+        self.tickers = list(self.store.tickers)
+
+    def chunks(self, start_date=None, end_date=None, after=None):
+        dates = self.store.dates
+        first, last = date_bounds(dates, start_date, end_date, after)
+        for i in range(first, last, self.chunksize):
+            j = min(i + self.chunksize, last)
+            yield dates[i:j].tolist(), np.array(self.store.close[i:j], dtype=float)
+
+
+class ArrayFeed:
+    def __init__(self, dates, prices, tickers, chunksize=None):
+        """
+        Args:
+            dates (np.ndarray): sorted date strings, one per row of prices
+            prices (np.ndarray): len(dates) x tickers closing prices
+            tickers (list): one per column of prices
+            chunksize (int): rows per chunk, whole range in one chunk when None
+        """
+        self.dates = np.asarray(dates)
+        self.prices = prices
+        self.tickers = list(tickers)
+        self.chunksize = chunksize
+
+    def chunks(self, start_date=None, end_date=None, after=None):
+        dates = self.dates
+        first, last = date_bounds(dates, start_date, end_date, after)
+        step = self.chunksize or max(last - first, 1)
+        for i in range(first, last, step):
+            j = min(i + step, last)
+            yield dates[i:j].tolist(), self.prices[i:j]
@@ -0,0 +1,263 @@
+import math
+from collections import deque
+
+import numpy as np
+
+"""
+Incremental rolling indicators
+    1) SMA ~ simple moving average kept as a running sum
+    2) RollingStd ~ sample standard deviation over a window (windowed Welford update)
+    3) EMA ~ exponential moving average, seeded with the first value
+
+Every update is O(1) no matter how large the window is. The running sums
+of SMA / SMAVector (total += new - old) would collect rounding error over
+a long history, so every window updates they are re-summed from the
+window itself (oldest to newest). That costs O(1) per update on average
+and bounds the error to one window's worth of updates.
+
+SMAVector is SMA for a whole universe at once: one update per bar with the
+closes of every ticker, the window kept as a ring-buffer matrix (window x
+tickers) and the running sums as a vector. Element for element it does the
+same arithmetic as SMA, so the averages are identical.
+
+Each update is stamped with the bar number it belongs to, and an indicator
+ignores a second update for a bar it has already seen. That lets several
+strategies on one feed share an IndicatorSet: whichever strategy reaches a
+bar first updates the shared indicator, the rest just read its value.
+"""
+
+
+def window_sum(values):
+    """Sum of a window, added oldest to newest (the order rolling_mean uses)"""
+    total = 0
+    for value in values:
+        total += value
+    return total
+
+
+class SMA:
+    __slots__ = ('window', 'values', 'total', 'bar', 'steps')
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque(maxlen=window)
+        self.total = 0
+        self.bar = 0
+        # updates since total was last re-summed
+        self.steps = 0
+
+    def update(self, value, bar=None):
+        """
+        Adds one value to the window
+
+        Args:
+            value (float): newest value
+            bar (int): bar number of the value, updates for a bar already seen are skipped
+        """
+        if bar is not None:
+            if bar <= self.bar:
+                return
+            self.bar = bar
+        if len(self.values) == self.window:
+            self.steps += 1
+            if self.steps == self.window:
+                self.values.append(value)
+                self.total = window_sum(self.values)
+                self.steps = 0
+                return
+            self.total += value - self.values[0]
+        else:
+            self.total += value
+        self.values.append(value)
+
+    @property
+    def ready(self):
+        return len(self.values) == self.window
+
+    @property
+    def value(self):
+        return self.total / self.window
+
+
+class RollingStd:
+    __slots__ = ('window', 'values', 'mean', 'm2', 'bar')
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque(maxlen=window)
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.bar = 0
+
+    def update(self, value, bar=None):
+        """
+        Adds one value to the window
+
+        Args:
+            value (float): newest value
+            bar (int): bar number of the value, updates for a bar already seen are skipped
+        """
+        if bar is not None:
+            if bar <= self.bar:
+                return
+            self.bar = bar
+        if len(self.values) == self.window:
+            old = self.values[0]
+            new_mean = self.mean + (value - old) / self.window
+            self.m2 += (value - old) * (value - new_mean + old - self.mean)
+            self.mean = new_mean
+        else:
+            delta = value - self.mean
+            self.mean += delta / (len(self.values) + 1)
+            self.m2 += delta * (value - self.mean)
+        self.values.append(value)
+
+    @property
+    def ready(self):
+        return len(self.values) == self.window
+
+    @property
+    def value(self):
+        if len(self.values) < 2:
+            return float('nan')
+        return math.sqrt(max(self.m2, 0.0) / (len(self.values) - 1))
+
+
+class EMA:
+    __slots__ = ('window', 'alpha', 'count', 'ema', 'bar')
+
+    def __init__(self, window):
+        self.window = window
+        self.alpha = 2 / (window + 1)
+        self.count = 0
+        self.ema = float('nan')
+        self.bar = 0
+
+    def update(self, value, bar=None):
+        """
+        Adds one value to the average
+
+        Args:
+            value (float): newest value
+            bar (int): bar number of the value, updates for a bar already seen are skipped
+        """
+        if bar is not None:
+            if bar <= self.bar:
+                return
+            self.bar = bar
+        if self.count == 0:
+            self.ema = value
+        else:
+            self.ema += self.alpha * (value - self.ema)
+        self.count += 1
+
+    @property
+    def ready(self):
+        return self.count >= self.window
+
+    @property
+    def value(self):
+        return self.ema
+
+
+class SMAVector:
+    __slots__ = ('window', 'buffer', 'total', 'count', 'pos', 'bar', 'steps')
+
+    def __init__(self, window, width):
+        """
+        Args:
+            window (int): number of periods in the average
+            width (int): number of tickers
+        """
+        self.window = window
+        self.buffer = np.empty((window, width))
+        self.total = np.zeros(width)
+        self.count = 0
+        self.pos = 0
+        self.bar = 0
+        self.steps = 0
+
+    def update(self, values, bar=None):
+        """
+        Adds one bar to the window
+
+        Args:
+            values (np.ndarray): newest value of every ticker
+            bar (int): bar number of the values, updates for a bar already seen are skipped
+        """
+        if bar is not None:
+            if bar <= self.bar:
+                return
+            self.bar = bar
+        resum = False
+        if self.count == self.window:
+            self.steps += 1
+            resum = self.steps == self.window
+            if not resum:
+                self.total += values - self.buffer[self.pos]
+        else:
+            self.total += values
+            self.count += 1
+        self.buffer[self.pos] = values
+        self.pos = (self.pos + 1) % self.window
+        if resum:
+            # oldest row first, same order as SMA
+            self.total = window_sum(self.buffer[(self.pos + k) % self.window] for k in range(self.window))
+            self.steps = 0
+
+    @property
+    def ready(self):
+        return self.count == self.window
+
+    @property
+    def value(self):
+        return self.total / self.window
+
+
+INDICATORS = {'sma': SMA, 'std': RollingStd, 'ema': EMA}
+VECTOR_INDICATORS = {'sma': SMAVector}
+
+
+class IndicatorSet:
+    def __init__(self):
+        """
+        Registry of indicators keyed by (ticker, kind, window)
+
+        Asking for the same (ticker, kind, window) twice returns the same
+        object, so strategies built with the same IndicatorSet compute each
+        indicator only once per bar.
+        """
+        self.indicators = {}
+
+    def get(self, ticker, kind, window):
+        """
+        Returns the indicator for (ticker, kind, window), creating it if needed
+
+        Args:
+            ticker (str): stock ticker symbol
+            kind (str): 'sma', 'std' or 'ema'
+            window (int): number of periods
+        """
+        key = (ticker, kind, window)
+        indicator = self.indicators.get(key)
+        if indicator is None:
+            indicator = self.indicators[key] = INDICATORS[kind](window)
+        return indicator
+
+    def get_vector(self, kind, window, width):
+        """
+        Returns the universe-wide indicator for (kind, window), creating it if needed
+
+        Args:
+            kind (str): 'sma'
+            window (int): number of periods
+            width (int): number of tickers
+        """
+        key = (None, kind, window)
+        indicator = self.indicators.get(key)
+        if indicator is None:
+            indicator = self.indicators[key] = VECTOR_INDICATORS[kind](window, width)
+        return indicator
+
+    def __len__(self):
+        return len(self.indicators)
@@ -0,0 +1,128 @@
+import cProfile
+import collections
+import json
+import pstats
+import sys
+import threading
+import time
+
+"""
+Per-stage instrumentation for BTE
+    1) timers ~ cumulative wall-clock seconds per stage of a bar:
+                signals (strategy.process_day), orders (portfolio.buy/sell, and
+                the order book sweep when the engine has one),
+                mark (portfolio.update), record (portfolio.record_equity)
+    2) counters ~ bars, signals, intrabar orders triggered, fills, rejected orders
+    3) hooks ~ callbacks run after a stage, hook(engine, date, **info)
+    4) profile ~ optional 'cprofile' (deterministic) or 'sample' (a thread
+                 sampling the running frame every interval seconds)
+
+Attach with BTE(..., instrument=Instrumentation()). Engines without one run
+the plain loop, so instrumentation costs nothing when it is off.
+"""
+
+STAGES = ['signals', 'orders', 'mark', 'record']
+
+
+class Instrumentation:
+    def __init__(self, profile=None, interval=0.001, top=25):
+        """
+        Args:
+            profile (str): None, 'cprofile' or 'sample'
+            interval (float): seconds between samples in 'sample' mode
+            top (int): number of functions kept in the profile report
+        """
+        if profile not in (None, 'cprofile', 'sample'):
+            raise ValueError(f"unknown profile mode {profile!r}")
+        self.profile = profile
+        self.interval = interval
+        self.top = top
+        self.timers = dict.fromkeys(STAGES, 0.0)
+        self.counters = dict.fromkeys(['bars', 'signals', 'orders', 'fills', 'rejected'], 0)
+        self.hooks = {stage: [] for stage in STAGES + ['bar']}
+        self.wall = 0.0
+        self.profile_report = None
+        self._profiler = None
+        self._sampler = None
+        self._samples = None
+        self._started = None
+
+    def add_hook(self, stage, hook):
+        """
+        Registers hook(engine, date, **info) to run after stage ('bar' runs after the whole bar)
+
+        info is signals=[...] after 'signals', fills=n, rejected=n after 'orders',
+        value=portfolio value after 'mark' and nothing after 'record'/'bar'
+        """
+        self.hooks[stage].append(hook)
+
+    def start(self):
+        self._started = time.perf_counter()
+        if self.profile == 'cprofile':
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        elif self.profile == 'sample':
+            self._samples = collections.Counter()
+            self._sampler = _Sampler(threading.get_ident(), self.interval, self._samples)
+            self._sampler.start()
+
+    def stop(self):
+        self.wall += time.perf_counter() - self._started
+        if self._profiler is not None:
+            self._profiler.disable()
+            stats = pstats.Stats(self._profiler)
+            rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)
+            self.profile_report = [{'function': f"{path}:{line}({name})",
+                                    'calls': nc,
+                                    'tottime': tt,
+                                    'cumtime': ct}
+                                   for (path, line, name), (cc, nc, tt, ct, _) in rows[:self.top]]
+            self._profiler = None
+        elif self._sampler is not None:
+            self._sampler.stop()
+            total = sum(self._samples.values()) or 1
+            self.profile_report = [{'function': function, 'samples': n, 'share': n / total}
+                                   for function, n in self._samples.most_common(self.top)]
+            self._sampler = None
+
+    def report(self):
+        """Structured summary of timers, counters and the profile (if any)"""
+        staged = sum(self.timers.values())
+        bars = self.counters['bars']
+        return {
+            'wall_seconds': self.wall,
+            'stage_seconds': dict(self.timers),
+            'other_seconds': max(self.wall - staged, 0.0),
+            'counters': dict(self.counters),
+            'bars_per_sec': bars / self.wall if self.wall else None,
+            'profile_mode': self.profile,
+            'profile': self.profile_report,
+        }
+
+    def to_json(self, path=None):
+        """Returns the report as JSON, also writing it to path if given"""
+        text = json.dumps(self.report(), indent=2)
+        if path is not None:
+            with open(path, 'w') as f:
+                f.write(text)
+        return text
+
+
+class _Sampler(threading.Thread):
+    def __init__(self, thread_id, interval, samples):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = samples
+        self.done = threading.Event()
+
+    def run(self):
+        while not self.done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                code = frame.f_code
+                self.samples[f"{code.co_filename}:{code.co_firstlineno}({code.co_name})"] += 1
+
+    def stop(self):
+        self.done.set()
+        self.join()
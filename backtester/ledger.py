@@ -0,0 +1,166 @@
+import numpy as np
+import pandas as pd
+
+"""
+Columnar equity ledger
+    1) cash ~ cash on hand at each snapshot
+    2) value ~ portfolio value at each snapshot
+    3) positions ~ shares held of each ticker at each snapshot (one column per ticker)
+    4) labels ~ the date (or 'START') each snapshot was taken on
+
+Rows are written into preallocated NumPy arrays that double in size when full,
+so recording a snapshot is O(1). The DataFrame is only built when asked for.
+
+OnlineLedger is the constant-memory stand-in: it keeps only the latest
+snapshot and feeds every snapshot to a metrics.OnlineMetrics.
+"""
+
+
+class EquityLedger:
+    def __init__(self, tickers, capacity=256):
+        self.tickers = list(tickers)
+        self.size = 0
+        self.labels = []
+        self.cash = np.empty(capacity, dtype=float)
+        self.value = np.empty(capacity, dtype=float)
+        self.positions = np.empty((capacity, len(self.tickers)), dtype=float)
+        self._frame = None
+
+    def __len__(self):
+        return self.size
+
+    def __getstate__(self):
+        # drop unused capacity and the cached frame when pickling (checkpoints)
+        state = dict(self.__dict__)
+        state['cash'] = self.cash[:self.size].copy()
+        state['value'] = self.value[:self.size].copy()
+        state['positions'] = self.positions[:self.size].copy()
+        state['_frame'] = None
+        return state
+
+    def add_tickers(self, tickers):
+        """Adds position columns, zero for every snapshot already recorded"""
+        self.tickers.extend(tickers)
+        extra = np.zeros((len(self.positions), len(tickers)))
+        self.positions = np.concatenate([self.positions, extra], axis=1)
+        self._frame = None
+
+    def _grow(self):
+        capacity = max(2 * len(self.cash), 1)
+        self.cash = np.resize(self.cash, capacity)
+        self.value = np.resize(self.value, capacity)
+        positions = np.empty((capacity, len(self.tickers)), dtype=float)
+        positions[:self.size] = self.positions[:self.size]
+        self.positions = positions
+
+    def append(self, date, cash, value, positions):
+        """
+        Writes one snapshot to the ledger
+
+        Args:
+            date: row label for the snapshot
+            cash (float): cash on hand
+            value (float): total portfolio value
+            positions (array-like): shares held, in the same order as self.tickers
+        """
+        if self.size == len(self.cash):
+            self._grow()
+        i = self.size
+        self.cash[i] = cash
+        self.value[i] = value
+        self.positions[i] = positions
+        self.labels.append(date)
+        self.size += 1
+        self._frame = None
+
+    def extend(self, dates, cash, value, positions):
+        """
+        Writes a block of snapshots to the ledger at once
+
+        Args:
+            dates (list): row labels, one per snapshot
+            cash (np.ndarray): cash on hand per snapshot
+            value (np.ndarray): total portfolio value per snapshot
+            positions (np.ndarray): snapshots x tickers shares held
+        """
+        n = len(dates)
+        while self.size + n > len(self.cash):
+            self._grow()
+        rows = slice(self.size, self.size + n)
+        self.cash[rows] = cash
+        self.value[rows] = value
+        self.positions[rows] = positions
+        self.labels.extend(dates)
+        self.size += n
+        self._frame = None
+
+    def to_frame(self):
+        """Builds (and caches) the equity curve as a DataFrame"""
+        if self._frame is None:
+            n = self.size
+            frame = pd.DataFrame(np.column_stack([self.cash[:n], self.value[:n], self.positions[:n]]),
+                                 columns=['Cash', 'Portfolio_value'] + self.tickers)
+            if n:
+                frame.index = self.labels
+            self._frame = frame
+        return self._frame
+
+
+class OnlineLedger:
+    def __init__(self, tickers, metrics):
+        """
+        Args:
+            tickers (list): position columns
+            metrics (OnlineMetrics): updated with every snapshot
+        """
+        self.tickers = list(tickers)
+        self.metrics = metrics
+        self.size = 0
+        self.label = None
+        self.cash = np.nan
+        self.value = np.nan
+        self.positions = np.zeros(len(self.tickers))
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def labels(self):
+        """Label of the latest snapshot (the only one kept)"""
+        return [self.label] if self.size else []
+
+    def add_tickers(self, tickers):
+        self.tickers.extend(tickers)
+        self.positions = np.concatenate([self.positions, np.zeros(len(tickers))])
+
+    def append(self, date, cash, value, positions):
+        """Same as EquityLedger.append, only the latest snapshot is kept"""
+        self.label = date
+        self.cash = cash
+        self.value = value
+        self.positions = np.array(positions, dtype=float)
+        self.size += 1
+        self.metrics.update(value, self.positions.sum() > 0)
+
+    def extend(self, dates, cash, value, positions):
+        """Same as EquityLedger.extend, only the latest snapshot is kept"""
+        n = len(dates)
+        if not n:
+            return
+        positions = np.asarray(positions, dtype=float)
+        self.metrics.extend(value, positions.sum(axis=1) > 0)
+        self.label = dates[-1]
+        self.cash = cash[-1]
+        self.value = value[-1]
+        self.positions = positions[-1].copy()
+        self.size += n
+
+    def to_frame(self):
+        """The latest snapshot as a one-row equity curve"""
+        frame = pd.DataFrame([[self.cash, self.value, *self.positions]],
+                             columns=['Cash', 'Portfolio_value'] + self.tickers)
+        if self.size:
+            frame.index = self.labels
+        else:
+            frame = frame.iloc[:0]
+        return frame
@@ -0,0 +1,161 @@
+import hashlib
+import inspect
+import json
+import os
+import pickle
+
+import numpy as np
+
+"""
+Content-addressed cache of finished runs
+    1) run key ~ sha1 of the strategy class and its parameters, the period
+                 bounds, the start cash, a fingerprint of the price data and
+                 a fingerprint of the code that produces results (CODE_MODULES:
+                 engine, portfolio, ledger, metrics, indicators, records,
+                 feed, runner, orders, datastore and the strategy's module),
+                 so editing any of them misses the old entries
+    2) RunCache ~ a directory of pickled runs named by key. A hit refreshes the
+                  entry's mtime, and once the directory grows past max_bytes
+                  the least recently used entries are deleted
+
+An entry holds the final portfolio (equity ledger, trades, closed trades)
+and the comp_performance metrics, so a hit rebuilds the same result a fresh
+run would give. The loop and vectorized engines produce identical runs and
+share entries.
+"""
+
+CACHE_DIR = "results/.runcache"
+MAX_BYTES = 512 * 2**20
+CODE_MODULES = ['engine', 'portfolio', 'ledger', 'metrics', 'indicators', 'strategies',
+                # trade records / FIFO lots, period slicing, warm starts, intrabar fills, market data
+                'records', 'feed', 'runner', 'orders', 'datastore']
+
+_code_hashes = {}
+
+
+def _file_hash(path):
+    if path not in _code_hashes:
+        with open(path, 'rb') as f:
+            _code_hashes[path] = hashlib.sha1(f.read()).hexdigest()
+    return _code_hashes[path]
+
+
+def code_fingerprint(strategy_class):
+    """Hash of the backtester modules that shape a run plus the strategy's own module"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    paths = [os.path.join(here, f"{name}.py") for name in CODE_MODULES]
+    source = inspect.getsourcefile(strategy_class)
+    if source and os.path.abspath(source) not in paths:
+        paths.append(os.path.abspath(source))
+    return hashlib.sha1("".join(_file_hash(p) for p in paths).encode()).hexdigest()
+
+
+def data_fingerprint(data):
+    """Hash of a closing price DataFrame's dates, tickers and values"""
+    digest = hashlib.sha1()
+    digest.update(json.dumps([str(d) for d in data.index]).encode())
+    digest.update(json.dumps([str(c) for c in data.columns]).encode())
+    digest.update(np.ascontiguousarray(data.to_numpy(dtype=float)).tobytes())
+    return digest.hexdigest()
+
+
+class RunCache:
+    def __init__(self, path=CACHE_DIR, max_bytes=MAX_BYTES):
+        """
+        Args:
+            path (str): directory holding the entries
+            max_bytes (int): total size kept, least recently used entries go first
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._fingerprints = {}
+        os.makedirs(path, exist_ok=True)
+
+    def key(self, strategy_class, params, start_date, end_date, start_cash, data, warmup=0):
+        """
+        Cache key of one run
+
+        Args:
+            data (pd.DataFrame): the prices the run reads (fingerprinted once per
+                                 DataFrame for the life of this cache object)
+            warmup (int): warm-up bars of the run (see BTE.warm_up), None for all
+        """
+        cached = self._fingerprints.get(id(data))
+        if cached is None or cached[0] is not data:
+            cached = self._fingerprints[id(data)] = (data, data_fingerprint(data))
+        spec = {
+            'strategy': f"{strategy_class.__module__}.{strategy_class.__qualname__}",
+            'params': params,
+            'start_date': start_date,
+            'end_date': end_date,
+            'start_cash': float(start_cash),
+            'warmup': warmup,
+            'data': cached[1],
+            'code': code_fingerprint(strategy_class),
+        }
+        return hashlib.sha1(json.dumps(spec, sort_keys=True, default=str).encode()).hexdigest()
+
+    def _file(self, key):
+        return os.path.join(self.path, f"{key}.pkl")
+
+    def get(self, key):
+        """The stored entry for key, None on a miss"""
+        path = self._file(key)
+        try:
+            with open(path, "rb") as f:
+                entry = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return None
+        # marks it recently used for evict(), unless another process just evicted it
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        self.hits += 1
+        return entry
+
+    def put(self, key, entry):
+        """Stores entry under key (atomically), then evicts down to max_bytes"""
+        tmp = f"{self._file(key)}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self._file(key))
+        self.evict()
+
+    def entries(self):
+        """(mtime, size, path) of every entry, least recently used first"""
+        entries = []
+        with os.scandir(self.path) as it:
+            for item in it:
+                if item.name.endswith(".pkl"):
+                    try:
+                        stat = item.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, item.path))
+        return sorted(entries)
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
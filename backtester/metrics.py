@@ -0,0 +1,335 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from backtester.records import column
+
+"""
+Performance metrics for many runs at once
+    1) batch_metrics ~ every comp_performance metric for a (runs x time) equity
+                       matrix plus a flat trades table keyed by run id
+    2) rolling_sharpe / rolling_drawdown ~ (runs x time) rolling-window series
+    3) stack_runs ~ builds those inputs from finished BTE runs
+    4) OnlineMetrics ~ the same metrics for one run, updated bar by bar in
+                       constant memory (Portfolio(history=False))
+
+Runs of different lengths are NaN-padded at the end of the matrix. Each
+run's returns, downside returns and trade pnls are reduced as one
+contiguous row of a matrix holding every run with the same count, which
+sums in the same order as pandas does for a single Series, so the results
+are identical to BTE.comp_performance for one run, not just close.
+
+Sharpe and Sortino are NaN (no warning) when the returns have zero
+variance or there are fewer than two of them.
+"""
+
+METRICS = ["Total Return", "Sharpe", "Sortino", "Max Drawdown",
+           "Win Rate", "Average Gain", "Average Loss", "Exposure"]
+PERIODS_PER_YEAR = 252
+
+
+def _groups(values, rows, n_rows):
+    """
+    Splits flat values belonging to rows (in order) into one matrix per
+    count, yielding (row ids, matrix) where each matrix row is one row's values
+    """
+    order = np.argsort(rows, kind='stable')
+    values = values[order]
+    counts = np.bincount(rows, minlength=n_rows)
+    starts = np.cumsum(counts) - counts
+    for k in np.unique(counts):
+        if k == 0:
+            continue
+        ids = np.flatnonzero(counts == k)
+        yield ids, values[starts[ids, None] + np.arange(k)]
+
+
+def _mean_std(values, rows, n_rows):
+    """Per-row mean and sample std (two-pass, as pandas), NaN where undefined"""
+    mean = np.full(n_rows, np.nan)
+    std = np.full(n_rows, np.nan)
+    for ids, matrix in _groups(values, rows, n_rows):
+        k = matrix.shape[1]
+        avg = matrix.sum(axis=1) / k
+        mean[ids] = avg
+        if k > 1:
+            std[ids] = np.sqrt(((avg[:, None] - matrix) ** 2).sum(axis=1) / (k - 1))
+    return mean, std
+
+
+def _ratio(mean, std):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(std > 0, mean / std * (PERIODS_PER_YEAR ** 0.5), np.nan)
+
+
+def _returns(equity):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return equity[:, 1:] / equity[:, :-1] - 1
+
+
+def batch_metrics(equity, trades=None, invested=None, run_ids=None):
+    """
+    Computes comp_performance's metrics for every run in one pass
+
+    Args:
+        equity (np.ndarray or pd.DataFrame): runs x time portfolio values, shorter
+                                             runs NaN-padded at the end (a
+                                             DataFrame's index gives the run ids)
+        trades (pd.DataFrame): closed trades of all runs, with 'run_id' and 'pnl' columns
+        invested (np.ndarray): runs x time total shares held, for Exposure (NaN if not given)
+        run_ids (list): run id of each row, defaults to the DataFrame index or 0..runs-1
+
+    Returns:
+        pd.DataFrame: one row per run (indexed by run id), METRICS columns
+    """
+    if isinstance(equity, pd.DataFrame):
+        run_ids = list(equity.index) if run_ids is None else run_ids
+        equity = equity.to_numpy(dtype=float)
+    equity = np.atleast_2d(np.asarray(equity, dtype=float))
+    n_runs = len(equity)
+    if run_ids is None:
+        run_ids = list(range(n_runs))
+    valid = ~np.isnan(equity)
+    lengths = valid.sum(axis=1)
+    rows = np.arange(n_runs)
+
+    # returns (pct_change, NaN ones dropped)
+    returns = _returns(equity)
+    r_rows, r_cols = np.nonzero(~np.isnan(returns))
+    flat = returns[r_rows, r_cols]
+    mean, std = _mean_std(flat, r_rows, n_runs)
+    down = flat < 0
+    _, down_std = _mean_std(flat[down], r_rows[down], n_runs)
+
+    # drawdown against the running max
+    peak = np.maximum.accumulate(np.where(valid, equity, -np.inf), axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drawdown = np.where(valid, (equity - peak) / peak, np.nan)
+
+    with np.errstate(invalid='ignore'):
+        total_return = equity[rows, np.maximum(lengths - 1, 0)] / equity[:, 0] - 1
+    metrics = {
+        "Total Return": total_return,
+        "Sharpe": _ratio(mean, std),
+        "Sortino": _ratio(mean, down_std),
+        "Max Drawdown": np.fmin.reduce(drawdown, axis=1),
+    }
+
+    # trades: win rate, average gain / loss (0 for runs without trades)
+    win_rate = np.zeros(n_runs)
+    avg_gain = np.zeros(n_runs)
+    avg_loss = np.zeros(n_runs)
+    if trades is not None and len(trades):
+        position = {run_id: i for i, run_id in enumerate(run_ids)}
+        t_rows = np.fromiter((position[r] for r in trades['run_id']), dtype=np.intp, count=len(trades))
+        pnl = np.asarray(trades['pnl'], dtype=float)
+        counts = np.bincount(t_rows, minlength=n_runs)
+        traded = counts > 0
+        win_rate[traded] = np.bincount(t_rows, pnl > 0, minlength=n_runs)[traded] / counts[traded]
+        avg_gain[traded] = _mean_std(pnl[pnl > 0], t_rows[pnl > 0], n_runs)[0][traded]
+        avg_loss[traded] = _mean_std(pnl[pnl < 0], t_rows[pnl < 0], n_runs)[0][traded]
+    metrics.update({"Win Rate": win_rate, "Average Gain": avg_gain, "Average Loss": avg_loss})
+
+    if invested is None:
+        metrics["Exposure"] = np.full(n_runs, np.nan)
+    else:
+        held = (np.asarray(invested, dtype=float) > 0) & valid
+        metrics["Exposure"] = held.sum(axis=1) / lengths
+
+    return pd.DataFrame(metrics, index=pd.Index(run_ids, name='run_id'), columns=METRICS)
+
+
+def _chunks(n_runs, width, window, budget=2**22):
+    step = max(1, budget // max(width * window, 1))
+    for start in range(0, n_runs, step):
+        yield slice(start, start + step)
+
+
+def rolling_sharpe(equity, window=63):
+    """
+    Annualized Sharpe of the last window returns at every bar (runs x time, NaN until filled)
+    """
+    equity = np.atleast_2d(np.asarray(equity, dtype=float))
+    out = np.full(equity.shape, np.nan)
+    if equity.shape[1] <= window:
+        return out
+    returns = _returns(equity)
+    for rows in _chunks(len(equity), returns.shape[1], window):
+        windows = sliding_window_view(returns[rows], window, axis=1)
+        avg = windows.sum(axis=2) / window
+        std = np.sqrt(((avg[..., None] - windows) ** 2).sum(axis=2) / (window - 1))
+        out[rows, window:] = _ratio(avg, std)
+    return out
+
+
+def rolling_drawdown(equity, window=63):
+    """
+    Drawdown from the highest value of the last window bars at every bar
+    (runs x time, NaN until filled)
+    """
+    equity = np.atleast_2d(np.asarray(equity, dtype=float))
+    out = np.full(equity.shape, np.nan)
+    if equity.shape[1] < window:
+        return out
+    for rows in _chunks(len(equity), equity.shape[1], window):
+        peak = sliding_window_view(equity[rows], window, axis=1).max(axis=2)
+        out[rows, window - 1:] = (equity[rows, window - 1:] - peak) / peak
+    return out
+
+
+def stack_runs(runs):
+    """
+    Builds batch_metrics inputs from finished runs
+
+    Args:
+        runs (dict): run id -> (performance frame, closed trades, tickers)
+
+    Returns:
+        (equity DataFrame (runs x bars), trades DataFrame, invested np.ndarray)
+    """
+    run_ids = list(runs)
+    width = max((len(performance) for performance, _, _ in runs.values()), default=0)
+    equity = np.full((len(run_ids), width), np.nan)
+    invested = np.zeros((len(run_ids), width))
+    pnl, trade_runs = [], []
+    for i, (performance, closed_trades, tickers) in enumerate(runs.values()):
+        n = len(performance)
+        equity[i, :n] = performance['Portfolio_value'].to_numpy()
+        if len(tickers):
+            invested[i, :n] = performance[list(tickers)].to_numpy().sum(axis=1)
+        pnl.extend(column(closed_trades, 'pnl').tolist())
+        trade_runs.extend([run_ids[i]] * len(closed_trades))
+    trades = pd.DataFrame({'run_id': trade_runs, 'pnl': np.asarray(pnl, dtype=float)})
+    return pd.DataFrame(equity, index=pd.Index(run_ids, name='run_id')), trades, invested
+
+
+class OnlineMetrics:
+    """
+    comp_performance metrics kept up to date one snapshot at a time
+
+    Return mean/variance and downside variance use Welford's update, so
+    nothing but a few running totals is stored. Results match batch_metrics
+    to rounding (sums are accumulated in a different order).
+    """
+    __slots__ = ('bars', 'first', 'last', 'peak', 'max_drawdown', 'invested',
+                 'n', 'mean', 'm2', 'down_n', 'down_mean', 'down_m2',
+                 'trades', 'wins', 'losses', 'gain_total', 'loss_total')
+
+    def __init__(self):
+        self.bars = 0
+        self.first = self.last = self.peak = np.nan
+        self.max_drawdown = 0.0
+        self.invested = 0
+        self.n = self.down_n = 0
+        self.mean = self.m2 = self.down_mean = self.down_m2 = 0.0
+        self.trades = self.wins = self.losses = 0
+        self.gain_total = self.loss_total = 0.0
+
+    def update(self, value, invested):
+        """
+        Adds one snapshot
+
+        Args:
+            value (float): portfolio value
+            invested (bool): any shares held
+        """
+        if self.bars:
+            r = value / self.last - 1 if self.last else np.nan
+            if r == r:
+                self.n += 1
+                delta = r - self.mean
+                self.mean += delta / self.n
+                self.m2 += delta * (r - self.mean)
+                if r < 0:
+                    self.down_n += 1
+                    delta = r - self.down_mean
+                    self.down_mean += delta / self.down_n
+                    self.down_m2 += delta * (r - self.down_mean)
+        else:
+            self.first = self.peak = value
+        self.bars += 1
+        self.last = value
+        self.invested += bool(invested)
+        if value > self.peak:
+            self.peak = value
+        drawdown = (value - self.peak) / self.peak
+        if drawdown < self.max_drawdown:
+            self.max_drawdown = drawdown
+
+    def extend(self, values, invested):
+        """
+        Adds a block of snapshots at once (merging the block's return
+        statistics into the running ones)
+
+        Args:
+            values (np.ndarray): portfolio value per snapshot
+            invested (np.ndarray): any shares held per snapshot
+        """
+        values = np.asarray(values, dtype=float)
+        if not len(values):
+            return
+        if not self.bars:
+            self.update(values[0], invested[0])
+            values, invested = values[1:], invested[1:]
+            if not len(values):
+                return
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = values / np.concatenate([[self.last], values[:-1]]) - 1
+        returns = returns[~np.isnan(returns)]
+        self.n, self.mean, self.m2 = _merge(self.n, self.mean, self.m2, returns)
+        self.down_n, self.down_mean, self.down_m2 = _merge(self.down_n, self.down_mean, self.down_m2,
+                                                           returns[returns < 0])
+        peaks = np.maximum.accumulate(np.concatenate([[self.peak], values]))[1:]
+        self.max_drawdown = min(self.max_drawdown, ((values - peaks) / peaks).min())
+        self.peak = peaks[-1]
+        self.last = values[-1]
+        self.bars += len(values)
+        self.invested += int(np.count_nonzero(invested))
+
+    def add_trade(self, pnl):
+        """Adds one closed trade's pnl"""
+        self.trades += 1
+        if pnl > 0:
+            self.wins += 1
+            self.gain_total += pnl
+        elif pnl < 0:
+            self.losses += 1
+            self.loss_total += pnl
+
+    @property
+    def drawdown(self):
+        """Drawdown of the latest snapshot"""
+        return (self.last - self.peak) / self.peak
+
+    def result(self):
+        """The comp_performance metrics so far"""
+        std = np.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else np.nan
+        down_std = np.sqrt(self.down_m2 / (self.down_n - 1)) if self.down_n > 1 else np.nan
+        mean = self.mean if self.n else np.nan
+        if self.trades:
+            win_rate = self.wins / self.trades
+            avg_gain = self.gain_total / self.wins if self.wins else np.nan
+            avg_loss = self.loss_total / self.losses if self.losses else np.nan
+        else:
+            win_rate = avg_gain = avg_loss = 0
+        return {
+            "Total Return": self.last / self.first - 1,
+            "Sharpe": float(_ratio(mean, std)),
+            "Sortino": float(_ratio(mean, down_std)),
+            "Max Drawdown": self.max_drawdown,
+            "Win Rate": win_rate,
+            "Average Gain": avg_gain,
+            "Average Loss": avg_loss,
+            "Exposure": self.invested / self.bars if self.bars else np.nan,
+        }
+
+
+def _merge(n, mean, m2, values):
+    """Merges a block of values into running (count, mean, M2) (Chan et al.)"""
+    k = len(values)
+    if not k:
+        return n, mean, m2
+    block_mean = values.sum() / k
+    block_m2 = ((values - block_mean) ** 2).sum()
+    total = n + k
+    delta = block_mean - mean
+    return total, mean + delta * k / total, m2 + block_m2 + delta * delta * n * k / total
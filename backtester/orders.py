@@ -0,0 +1,184 @@
+import numpy as np
+
+"""
+Intrabar stop / limit orders
+    1) limit ~ BUY fills once Low <= price, at min(Open, price)
+               SELL fills once High >= price, at max(Open, price)
+    2) stop ~ BUY fills once High >= price, at max(Open, price)
+              SELL fills once Low <= price, at min(Open, price)
+    3) stop-loss ~ a stop placed for the shares every fill opens: a SELL stop
+                   at fill price * (1 - stop_loss) below a long, a BUY stop at
+                   fill price * (1 + stop_loss) above a short (Portfolio with
+                   allow_short). Fills that only reduce or cover a position
+                   place none, and the position's stop-losses are cancelled
+                   once it reaches or crosses zero. A triggered stop-loss
+                   closes at most the shares still held, never reverses
+
+Pending orders are kept as parallel arrays (ticker id, side, quantity, kind,
+price), so each bar every order is checked against that bar's Open/High/Low
+in a few vector operations. Orders placed during a bar can fill from the
+next bar on. Orders are one-shot: filled, rejected by the portfolio (not
+enough cash / shares) or cancelled, they are removed.
+
+A stop-loss closes the position behind the strategy's back: the strategy
+still thinks it is in the position, so its own exit signal is rejected
+(not enough shares) and it re-enters on its next entry signal as usual.
+"""
+
+LIMIT = 0
+STOP = 1
+OPEN, HIGH, LOW = 'Open', 'High', 'Low'
+
+
+class OrderBook:
+    def __init__(self, stop_loss=None, capacity=64):
+        """
+        Args:
+            stop_loss (float): fraction beyond a fill price to place the stop-loss
+                               of the shares it opens at (ex. 0.05), no
+                               automatic stop-losses when None
+            capacity (int): initial room for pending orders
+        """
+        self.stop_loss = stop_loss
+        self.size = 0
+        self.ticker = np.empty(capacity, dtype=np.intp)
+        self.side = np.empty(capacity, dtype=np.int8)
+        self.quantity = np.empty(capacity, dtype=float)
+        self.kind = np.empty(capacity, dtype=np.int8)
+        self.price = np.empty(capacity, dtype=float)
+        self.protective = np.empty(capacity, dtype=bool)
+
+    def __len__(self):
+        return self.size
+
+    def _grow(self):
+        capacity = max(2 * len(self.ticker), 1)
+        for name in ('ticker', 'side', 'quantity', 'kind', 'price', 'protective'):
+            setattr(self, name, np.resize(getattr(self, name), capacity))
+
+    def place(self, ticker_id, side, quantity, kind, price, protective=False):
+        """
+        Adds one pending order
+
+        Args:
+            ticker_id (int): column of the ticker in the engine's data
+            side (int): 1 = BUY, -1 = SELL
+            quantity (float): shares
+            kind (int): LIMIT or STOP
+            price (float): limit / stop price
+            protective (bool): a stop-loss, cancelled when the position closes
+        """
+        if kind not in (LIMIT, STOP):
+            raise ValueError(f"unknown order kind {kind!r}")
+        if self.size == len(self.ticker):
+            self._grow()
+        i = self.size
+        self.ticker[i] = ticker_id
+        self.side[i] = 1 if side > 0 else -1
+        self.quantity[i] = quantity
+        self.kind[i] = kind
+        self.price[i] = price
+        self.protective[i] = protective
+        self.size += 1
+
+    def limit(self, ticker_id, side, quantity, price):
+        self.place(ticker_id, side, quantity, LIMIT, price)
+
+    def stop(self, ticker_id, side, quantity, price):
+        self.place(ticker_id, side, quantity, STOP, price)
+
+    def _keep(self, keep):
+        n = int(keep.sum())
+        for name in ('ticker', 'side', 'quantity', 'kind', 'price', 'protective'):
+            array = getattr(self, name)
+            array[:n] = array[:self.size][keep]
+        self.size = n
+
+    def cancel(self, ticker_id, protective_only=True):
+        """Removes pending orders of one ticker (only its stop-losses by default)"""
+        n = self.size
+        drop = self.ticker[:n] == ticker_id
+        if protective_only:
+            drop &= self.protective[:n]
+        if drop.any():
+            self._keep(~drop)
+
+    def triggered(self, opens, highs, lows):
+        """
+        Orders the bar fills
+
+        Args:
+            opens, highs, lows (np.ndarray): the bar's prices of every ticker column
+
+        Returns:
+            (order positions, fill prices), in the order the orders were placed
+        """
+        n = self.size
+        if not n:
+            return np.zeros(0, dtype=np.intp), np.zeros(0)
+        ticker = self.ticker[:n]
+        price = self.price[:n]
+        # buy limits and sell stops trigger on the Low, buy stops and sell limits on the High
+        downward = (self.side[:n] > 0) == (self.kind[:n] == LIMIT)
+        hit = np.where(downward, lows[ticker] <= price, highs[ticker] >= price)
+        orders = np.flatnonzero(hit)
+        opens = opens[ticker[orders]]
+        fills = np.where(downward[orders], np.fmin(opens, price[orders]), np.fmax(opens, price[orders]))
+        return orders, fills
+
+    def sweep(self, engine, date, bars):
+        """
+        Fills every triggered order through the engine's portfolio
+
+        Args:
+            engine (BTE): engine whose tickers / portfolio the orders refer to
+            date (str): bar date
+            bars (np.ndarray): tickers x fields bars of the date (engine.ohlcv.fields order)
+
+        Returns:
+            (int, int): orders filled, orders triggered (the rest were rejected by the portfolio)
+        """
+        if not self.size:
+            return 0, 0
+        fields = engine.ohlcv.fields
+        orders, fills = self.triggered(bars[:, fields.index(OPEN)], bars[:, fields.index(HIGH)],
+                                       bars[:, fields.index(LOW)])
+        if not len(orders):
+            return 0, 0
+        tickers = self.ticker[orders].tolist()
+        sides = self.side[orders].tolist()
+        quantities = self.quantity[orders].tolist()
+        protective = self.protective[orders].tolist()
+        keep = np.ones(self.size, dtype=bool)
+        keep[orders] = False
+        self._keep(keep)
+
+        filled = 0
+        for j, side, quantity, price, stop_loss in zip(tickers, sides, quantities, fills.tolist(), protective):
+            if stop_loss:
+                # an earlier fill of this bar may already have closed the position
+                held = engine.portfolio.shares[engine.ticker_ids[j]]
+                if held * side >= 0:
+                    continue
+                quantity = min(quantity, abs(held))
+            filled += bool(engine.fill(j, side, quantity, price, date))
+        return filled, len(orders)
+
+    def on_fill(self, engine, ticker_id, side, quantity, price):
+        """Places / cancels stop-losses after a fill (called by BTE.fill)"""
+        held = engine.portfolio.shares[engine.ticker_ids[ticker_id]]
+        before = held - side * quantity
+        # the position reached or crossed zero: its stop-losses are stale
+        if before != 0 and (held == 0 or (held > 0) != (before > 0)):
+            self.cancel(ticker_id)
+        if self.stop_loss is None or held == 0:
+            return
+        if (held > 0) != (side > 0):
+            # only reduced or covered the position
+            return
+        # shares the fill opened: all of a flipped position, else the added lot
+        opened = abs(held) if before == 0 or (held > 0) != (before > 0) else quantity
+        if held > 0:
+            self.place(ticker_id, -1, opened, STOP, price * (1 - self.stop_loss), protective=True)
+        else:
+            self.place(ticker_id, 1, opened, STOP, price * (1 + self.stop_loss), protective=True)
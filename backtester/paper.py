@@ -0,0 +1,344 @@
+import argparse
+import asyncio
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from backtester.datastore import OHLCV_CSV, OHLCVIndex
+
+"""
+Paper trading on an asyncio bar stream
+    1) serve_replay ~ TCP (or Unix socket) server replaying closing prices,
+                      by default Data/clean_stock_data.csv, at speed bars per
+                      second (as fast as the client reads when None)
+    2) StreamSource ~ bars read from a replay server; FeedSource ~ bars of any
+                      backtester.feed feed, optionally paced the same way
+    3) PaperTrader ~ feeds each bar to BTE.step as it arrives, so the same
+                     Portfolio is updated bar by bar, and times every bar
+
+Wire format: one JSON header line {"tickers": [...], "date_bytes": n}, then
+one frame per bar: the date (n ascii bytes) followed by one little-endian
+float64 close per ticker. Frames are parsed as views of the received bytes.
+
+Backpressure: bars go from the source to the engine through a bounded
+asyncio.Queue. When the engine falls behind the queue fills, the source
+stops reading the socket and the server's drain() waits on the full socket
+buffers, so nothing upstream grows without bound.
+
+Latency per bar: 'queue' is the time from receiving a bar to the engine
+starting on it, 'decision' the time BTE.step takes on it (signals, fills,
+mark to market, equity snapshot).
+"""
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+class _Pacer:
+    def __init__(self, speed=None):
+        self.interval = 1 / speed if speed else None
+        self.start = None
+
+    async def wait(self, i):
+        """Sleeps until bar i is due"""
+        if self.interval is None:
+            return
+        now = time.perf_counter()
+        if self.start is None:
+            self.start = now
+        delay = self.start + i * self.interval - now
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def replay_closes(path=OHLCV_CSV):
+    """Date x ticker closes of a long Date, Ticker, ... table (ex. Data/clean_stock_data.csv)"""
+    index = OHLCVIndex.from_long(pd.read_csv(path), fields=['Close'])
+    return pd.DataFrame(index.ohlcv[:, :, 0], index=index.dates, columns=index.tickers)
+
+
+async def serve_replay(data=None, host="127.0.0.1", port=0, unix_path=None, speed=None):
+    """
+    Starts a replay server, every connection gets the whole history from the first bar
+
+    Args:
+        data (pd.DataFrame): Date indexed closes, one column per ticker,
+                             replay_closes() when not given
+        host, port (str, int): TCP address (port 0 picks a free port)
+        unix_path (str): serve on this Unix socket instead of TCP
+        speed (float): bars per second, as fast as the client reads when None
+
+    Returns:
+        asyncio.Server
+    """
+    if data is None:
+        data = replay_closes()
+    dates = [str(d).encode() for d in data.index]
+    date_bytes = max(map(len, dates), default=0)
+    dates = [d.ljust(date_bytes) for d in dates]
+    closes = data.to_numpy(dtype='<f8')
+    header = json.dumps({'tickers': [str(t) for t in data.columns], 'date_bytes': date_bytes}).encode() + b"\n"
+
+    async def handle(reader, writer):
+        pacer = _Pacer(speed)
+        try:
+            writer.write(header)
+            for i, date in enumerate(dates):
+                await pacer.wait(i)
+                writer.write(date + closes[i].tobytes())
+                await writer.drain()
+        except (ConnectionResetError, BrokenPipeError):
+            pass
+        finally:
+            writer.close()
+
+    if unix_path is not None:
+        return await asyncio.start_unix_server(handle, unix_path)
+    return await asyncio.start_server(handle, host, port)
+
+
+class StreamSource:
+    def __init__(self, host="127.0.0.1", port=None, unix_path=None):
+        """
+        Args:
+            host, port (str, int): TCP address of a replay server
+            unix_path (str): Unix socket of a replay server instead
+        """
+        self.host = host
+        self.port = port
+        self.unix_path = unix_path
+        self.tickers = None
+        self._reader = None
+        self._writer = None
+
+    async def open(self):
+        """Connects and reads the header (tickers)"""
+        if self.unix_path is not None:
+            self._reader, self._writer = await asyncio.open_unix_connection(self.unix_path)
+        else:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        header = json.loads(await self._reader.readline())
+        self.tickers = header['tickers']
+        self._date_bytes = header['date_bytes']
+
+    async def bars(self):
+        """Yields (date, closes) until the server closes the stream"""
+        date_bytes = self._date_bytes
+        frame = date_bytes + 8 * len(self.tickers)
+        while True:
+            try:
+                buffer = await self._reader.readexactly(frame)
+            except asyncio.IncompleteReadError as e:
+                if e.partial:
+                    raise ConnectionError(f"stream ended inside a bar ({len(e.partial)} of {frame} bytes)")
+                return
+            yield buffer[:date_bytes].decode().rstrip(), np.frombuffer(buffer, '<f8', offset=date_bytes)
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except (ConnectionResetError, BrokenPipeError):
+                pass
+
+
+class FeedSource:
+    def __init__(self, feed, speed=None, start_date=None, end_date=None):
+        """
+        Args:
+            feed: bar feed (see backtester.feed)
+            speed (float): bars per second, unpaced when None
+            start_date, end_date (str): range of the feed to play
+        """
+        self.feed = feed
+        self.tickers = list(feed.tickers)
+        self.speed = speed
+        self.start_date = start_date
+        self.end_date = end_date
+
+    async def open(self):
+        pass
+
+    async def bars(self):
+        pacer = _Pacer(self.speed)
+        i = 0
+        for dates, prices in self.feed.chunks(self.start_date, self.end_date):
+            for date, row in zip(dates, prices):
+                await pacer.wait(i)
+                i += 1
+                yield date, row
+
+    async def close(self):
+        pass
+
+
+def latency_table(**samples):
+    """
+    Latency percentiles in microseconds
+
+    Args:
+        samples: name=list of nanosecond durations
+
+    Returns:
+        pd.DataFrame: one row per name: mean, p50 ... p99.9, max
+    """
+    rows = {}
+    for name, ns in samples.items():
+        us = np.asarray(ns, dtype=float) / 1e3
+        if not len(us):
+            us = np.full(1, np.nan)
+        row = {'mean': us.mean()}
+        row.update({f'p{p:g}': v for p, v in zip(PERCENTILES, np.percentile(us, PERCENTILES))})
+        row['max'] = us.max()
+        rows[name] = row
+    return pd.DataFrame.from_dict(rows, orient='index')
+
+
+class PaperTrader:
+    def __init__(self, engine, queue_size=256):
+        """
+        Args:
+            engine (BTE): engine whose strategy and portfolio trade the stream
+            queue_size (int): bars buffered between the source and the engine
+        """
+        self.engine = engine
+        self.queue_size = queue_size
+        self.decision_ns = []
+        self.queue_ns = []
+        self.max_depth = 0
+        self.elapsed = 0.0
+
+    def _columns(self, tickers):
+        """Positions of the engine's tickers in the stream, None when the order already matches"""
+        if list(tickers) == self.engine.tickers:
+            return None
+        columns = {t: j for j, t in enumerate(tickers)}
+        missing = [t for t in self.engine.tickers if t not in columns]
+        if missing:
+            raise ValueError(f"tickers not in the stream: {missing[:10]}")
+        return np.array([columns[t] for t in self.engine.tickers], dtype=np.intp)
+
+    async def run(self, source, start_date=None, end_date=None):
+        """
+        Trades every bar of source, bars up to the engine's last_date are skipped
+
+        Args:
+            source: StreamSource / FeedSource (anything with open, bars, close and tickers)
+            start_date, end_date (str): only trade bars in this range
+
+        Returns:
+            pd.DataFrame: engine.build_results()
+        """
+        engine = self.engine
+        await source.open()
+        take = self._columns(source.tickers)
+        if len(engine.portfolio.ledger) == 0:
+            engine.portfolio.record_equity(date='START')
+        after = engine.last_date
+        queue = asyncio.Queue(self.queue_size)
+
+        async def produce():
+            try:
+                async for date, row in source.bars():
+                    if (after and date <= after) or (start_date and date < start_date):
+                        continue
+                    if end_date and date > end_date:
+                        break
+                    await queue.put((date, row, time.perf_counter_ns()))
+            except Exception:
+                await queue.put(None)
+                raise
+            await queue.put(None)
+
+        started = time.perf_counter()
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                self.max_depth = max(self.max_depth, queue.qsize())
+                item = await queue.get()
+                if item is None:
+                    break
+                date, row, received = item
+                begin = time.perf_counter_ns()
+                engine.step(date, row if take is None else row[take])
+                self.decision_ns.append(time.perf_counter_ns() - begin)
+                self.queue_ns.append(begin - received)
+            await producer
+        finally:
+            producer.cancel()
+            await source.close()
+            self.elapsed += time.perf_counter() - started
+        return engine.build_results()
+
+    def latency(self):
+        """queue / decision latency percentiles (see latency_table)"""
+        return latency_table(queue=self.queue_ns, decision=self.decision_ns)
+
+    @property
+    def bars_per_second(self):
+        return len(self.decision_ns) / self.elapsed if self.elapsed else float('nan')
+
+
+def paper_trade(engine, source, queue_size=256, start_date=None, end_date=None):
+    """Runs a PaperTrader to the end of source, returns (performance, trader)"""
+    trader = PaperTrader(engine, queue_size)
+    performance = asyncio.run(trader.run(source, start_date, end_date))
+    return performance, trader
+
+
+async def _replay_and_trade(engine, args):
+    server = await serve_replay(speed=args.speed, port=0, unix_path=args.unix)
+    async with server:
+        if args.unix:
+            source = StreamSource(unix_path=args.unix)
+        else:
+            source = StreamSource(port=server.sockets[0].getsockname()[1])
+        trader = PaperTrader(engine, args.queue)
+        performance = await trader.run(source)
+    return performance, trader
+
+
+def main(argv=None):
+    from backtester.engine import BTE
+    from backtester.portfolio import Portfolio
+    from backtester.sweep import STRATEGIES
+
+    parser = argparse.ArgumentParser(description="Paper trading against a replayed bar stream")
+    parser.add_argument("--serve", action="store_true", help="only run the replay server")
+    parser.add_argument("--connect", action="store_true", help="trade against a running replay server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", default=None, help="Unix socket path instead of TCP")
+    parser.add_argument("--speed", type=float, default=None, help="bars per second (default: as fast as possible)")
+    parser.add_argument("--strategy", choices=list(STRATEGIES), default="TrendFollowing")
+    parser.add_argument("--cash", type=float, default=10000)
+    parser.add_argument("--queue", type=int, default=256, help="bars buffered before backpressure")
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        async def serve():
+            server = await serve_replay(host=args.host, port=args.port, unix_path=args.unix, speed=args.speed)
+            print(f"Replaying on {args.unix or f'{args.host}:{args.port}'}")
+            async with server:
+                await server.serve_forever()
+        try:
+            asyncio.run(serve())
+        except KeyboardInterrupt:
+            pass
+        return
+
+    engine = BTE(Portfolio(args.cash), STRATEGIES[args.strategy]())
+    if args.connect:
+        performance, trader = paper_trade(engine, StreamSource(args.host, args.port, args.unix), args.queue)
+    else:
+        performance, trader = asyncio.run(_replay_and_trade(engine, args))
+    print(f"{len(trader.decision_ns)} bars, {trader.bars_per_second:,.0f} bars/s, "
+          f"max queue depth {trader.max_depth}")
+    print(trader.latency().to_string(float_format=lambda v: f"{v:,.1f}"))
+    print(f"Final value: {performance['Portfolio_value'].iloc[-1]:,.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,93 +1,164 @@
+import logging
+
+import numpy as np
 import pandas as pd
+from backtester.ledger import EquityLedger, OnlineLedger
+from backtester.metrics import OnlineMetrics
+from backtester.records import ROUND_TRIP_FIELDS, TRADE_FIELDS, LotBook, RecordLog
 
 """
 Variables/notes
     1) start_cash ~ The amount of money you have to trade (before any trades are done)
     2) cash ~ The amount of cash you have
-    3) positions ~ How many shares of each stock owned
+    3) positions ~ How many shares of each stock owned (self.shares, indexed by ticker id)
         ex. Ticker   Shares
              AAPL      10
              SPY        5
     4) portfolio_value ~ Total value of portfolio (position (how many shares) * current price of stock)
     5) equity_curve ~ Record of portfolio value/positions over time
-    6) trades ~ A record of every buy or sell action
+    6) trades ~ A record of every buy or sell action (a records.RecordLog,
+                read like a list of dicts, to_frame() for a DataFrame)
+    7) tickers ~ The universe, ticker_ids maps each ticker to its index in
+                 shares/cost_basis (cost of the shares currently held)
+    8) lots ~ open lots per ticker (records.LotBook): sells close the oldest
+              buys first (FIFO), each closed lot is one row of closed_trades
+              with its own entry price and date, so scale-ins keep their
+              cost basis. With allow_short, selling more than is held opens a
+              short lot that later buys cover
+    9) metrics ~ with history=False the equity curve is not kept, only its
+                 latest row; metrics (OnlineMetrics) holds the performance
+                 metrics updated at every snapshot and closed trade
+    10) rejected orders ~ logged at INFO on the "backtester.portfolio" logger,
+                          silent unless logging is set up to show them
 """
 
+log = logging.getLogger(__name__)
+
 
-tickers = ['AAPL', 'JNJ', 'SPY']
 class Portfolio:
-    def __init__(self, start_cash = 10000):
+    def __init__(self, start_cash = 10000, tickers=None, history=True, allow_short=False):
+        """
+        Args:
+            start_cash (float): cash before any trades
+            tickers (list): initial universe, more tickers are added as they are
+                            traded or when an engine attaches its data
+            history (bool): keep the full equity curve, False for constant
+                            memory (online metrics only)
+            allow_short (bool): let sells go below zero shares (short lots)
+        """
         self.cash = start_cash
-        self.positions = pd.Series(0, index=tickers, dtype=float)
+        self.tickers = []
+        self.ticker_ids = {}
+        self.shares = np.zeros(0)
+        self.cost_basis = np.zeros(0)
         self.portfolio_value = start_cash
-        self.equity_curve = pd.DataFrame(columns=['Cash', 'Portfolio_value'] + tickers)
-        self.trades = []
-        self.closed_trades = []
-        self.open_positions = {}
+        if history:
+            self.metrics = None
+            self.ledger = EquityLedger([])
+        else:
+            self.metrics = OnlineMetrics()
+            self.ledger = OnlineLedger([], self.metrics)
+        self.allow_short = allow_short
+        self.trades = RecordLog(TRADE_FIELDS)
+        self.closed_trades = RecordLog(ROUND_TRIP_FIELDS)
+        self.lots = LotBook()
+        self.add_tickers(tickers or [])
+
+    def add_tickers(self, tickers):
+        """Adds any new tickers to the universe, returns the integer ids of all of them"""
+        new = []
+        for ticker in tickers:
+            if ticker not in self.ticker_ids:
+                self.ticker_ids[ticker] = len(self.tickers)
+                self.tickers.append(ticker)
+                new.append(ticker)
+        if new:
+            self.ledger.add_tickers(new)
+            self.shares = np.concatenate([self.shares, np.zeros(len(new))])
+            self.cost_basis = np.concatenate([self.cost_basis, np.zeros(len(new))])
+        return [self.ticker_ids[ticker] for ticker in tickers]
+
+    def ticker_id(self, ticker):
+        i = self.ticker_ids.get(ticker)
+        if i is None:
+            i = self.add_tickers([ticker])[0]
+        return i
+
+    @property
+    def positions(self):
+        """Shares held per ticker (a copy, trade through buy/sell)"""
+        return pd.Series(self.shares, index=self.tickers, dtype=float)
+
+    @property
+    def open_positions(self):
+        """{ticker: {entry_price (average of the open lots), shares, entry_date (oldest lot)}}"""
+        positions = {}
+        for i, lots in self.lots.lots.items():
+            if lots:
+                shares = sum(lot.shares for lot in lots)
+                cost = sum(lot.shares * lot.price for lot in lots)
+                positions[self.tickers[i]] = {"entry_price": cost / shares if len(lots) > 1 else lots[0].price,
+                                              "shares": shares,
+                                              "entry_date": lots[0].date}
+        return positions
 
     def buy(self, ticker, shares, price, date):
+        i = self.ticker_id(ticker)
         tot_cost = shares*price
         if self.cash < (tot_cost):
-            print("Can't make trade, not enough money")
-            return
+            log.info("Can't make trade, not enough money (%s %s on %s)", ticker, shares, date)
+            return False
         self.cash -= (tot_cost)
-        self.positions[ticker] += shares
-        self.trades.append({'date': date, 
-                            'action': "BUY", 
-                            'ticker': ticker, 
-                            'shares': shares, 
-                            'price': price, 
-                            'notional': tot_cost})
-        self.open_positions[ticker] = {"entry_price": price,
-                                       "shares": shares, 
-                                       "entry_date": date}
+        self.shares[i] += shares
+        self.trades.append(date, "BUY", ticker, shares, price, tot_cost)
+        self._fill(i, ticker, shares, price, date)
+        return True
 
     def sell(self, ticker, shares, price, date):
-        shares_held = self.positions[ticker]
-        if shares_held < shares:
-            print("Can't sell, not enough shares")
-            return
+        i = self.ticker_id(ticker)
+        shares_held = self.shares[i]
+        if shares_held < shares and not self.allow_short:
+            log.info("Can't sell, not enough shares (%s %s on %s)", ticker, shares, date)
+            return False
         
         tot_proceeds = shares*price
         self.cash += tot_proceeds
-        self.positions[ticker] -= shares
-        self.trades.append({'date': date, 
-                            'action': "SELL", 
-                            'ticker': ticker, 
-                            'shares': shares, 
-                            'price': price,
-                            'notional': tot_proceeds})
+        self.shares[i] -= shares
+        self.trades.append(date, "SELL", ticker, shares, price, tot_proceeds)
+        self._fill(i, ticker, -shares, price, date)
+        return True
 
-        if self.positions[ticker] == 0 and ticker in self.open_positions:
-            entry = self.open_positions.pop(ticker)
-            pnl = (price - entry["entry_price"]) * entry["shares"]
-            self.closed_trades.append({ "ticker": ticker,
-                                        "entry_date": entry["entry_date"],
-                                        "exit_date": date,
-                                        "entry_price": entry["entry_price"],
-                                        "exit_price": price,
-                                        "shares": shares,
-                                        "pnl": pnl})
+    def _fill(self, i, ticker, shares, price, date):
+        """Closes / opens lots for a signed fill, one closed_trades row per closed lot"""
+        closed, opened = self.lots.fill(i, shares, price, date)
+        for lot in closed:
+            self.cost_basis[i] -= lot.shares*lot.price
+            pnl = (price - lot.price) * lot.shares
+            self.closed_trades.append(ticker, lot.date, date, lot.price, price, lot.shares, pnl)
+            if self.metrics is not None:
+                self.metrics.add_trade(pnl)
+        if opened:
+            self.cost_basis[i] += opened*price
 
     def update(self, current_prices):
-        holdings_val = (self.positions * current_prices[tickers]).sum()
+        """
+        Marks the portfolio to market
+
+        Args:
+            current_prices: np.ndarray of prices in self.tickers order,
+                            or a Series/dict of prices by ticker
+        """
+        if isinstance(current_prices, np.ndarray):
+            prices = current_prices
+        else:
+            prices = np.array([current_prices[t] for t in self.tickers], dtype=float)
+        holdings_val = (self.shares * prices).sum()
         self.portfolio_value = self.cash + holdings_val
     
+    @property
+    def equity_curve(self):
+        return self.ledger.to_frame()
+
     def record_equity(self, date):
         #append "snapshot" of cash, positions, portfolio_value to equity curve
-
-        for col in ['Portfolio_value', 'Cash'] + tickers:
-            if col not in self.equity_curve.columns:
-                self.equity_curve[col] = 0
-
-        new_row = pd.DataFrame({'Cash': [self.cash],
-                   'Portfolio_value': [self.portfolio_value]})
-        for tick in tickers:
-            new_row[tick] = self.positions[tick]
-
-        new_row.index = [date]
-        if self.equity_curve.empty:
-            self.equity_curve = new_row
-        else:
-            self.equity_curve = pd.concat([self.equity_curve, new_row])
-        
\ No newline at end of file
+        self.ledger.append(date, self.cash, self.portfolio_value, self.shares)
@@ -0,0 +1,241 @@
+import collections
+
+import numpy as np
+import pandas as pd
+
+"""
+Compact records for signals, fills, round trips and open lots
+    1) Signal ~ one process_day order in __slots__ (ticker, action, quantity),
+                still read as signal["action"] like the dicts it replaces
+    2) RecordLog ~ an append-only table kept as one numpy array per column:
+                   rows are buffered as tuples and moved into the columns
+                   chunk rows at a time (the columns grow by doubling), text
+                   columns are stored as codes into a list of values (int8,
+                   widened as values are added, the width pandas uses for
+                   categorical codes)
+    3) TRADE_FIELDS / ROUND_TRIP_FIELDS ~ columns of Portfolio.trades (one row
+                                          per fill) and Portfolio.closed_trades
+                                          (one row per closed lot)
+    4) Lot / LotBook ~ open lots per ticker in FIFO order: a fill first closes
+                       the oldest lots on the other side (long lots for a
+                       sell, short lots for a buy) and opens a lot with what
+                       is left, so scale-ins keep each entry's price and date
+
+A RecordLog still behaves like the list of dicts it replaces (len,
+indexing, iteration, ==), and to_frame() exports it without copying: the
+DataFrame columns are read-only views of the log's arrays (text columns
+categoricals over the code arrays, .astype(str) for plain strings).
+
+A closed lot's shares are signed (negative for a short), so its pnl is
+always (exit_price - entry_price) * shares.
+"""
+
+TRADE_FIELDS = [('date', str), ('action', str), ('ticker', str),
+                ('shares', float), ('price', float), ('notional', float)]
+ROUND_TRIP_FIELDS = [('ticker', str), ('entry_date', str), ('exit_date', str),
+                     ('entry_price', float), ('exit_price', float), ('shares', float), ('pnl', float)]
+
+
+def _code_dtype(categories):
+    """Smallest code type for this many values (as pandas picks for categorical codes)"""
+    for dtype in (np.int8, np.int16, np.int32):
+        if categories < np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def column(rows, name):
+    """One column of a RecordLog, a DataFrame or a list of dicts, as an array"""
+    if isinstance(rows, RecordLog):
+        return rows.column(name)
+    if isinstance(rows, pd.DataFrame):
+        return rows[name].to_numpy()
+    return np.asarray([row[name] for row in rows])
+
+
+class Signal:
+    __slots__ = ('ticker', 'action', 'quantity')
+
+    def __init__(self, ticker, action, quantity):
+        self.ticker = ticker
+        self.action = action
+        self.quantity = quantity
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def __eq__(self, other):
+        if isinstance(other, (Signal, dict)):
+            return all(self[k] == other[k] for k in self.__slots__)
+        return NotImplemented
+
+    def __repr__(self):
+        return f"Signal({self.ticker!r}, {self.action!r}, {self.quantity!r})"
+
+
+class RecordLog:
+    def __init__(self, fields, chunk=4096):
+        """
+        Args:
+            fields (list): (name, type) columns, type str (stored as codes) or a numeric type
+            chunk (int): rows buffered before they are moved into the columns
+        """
+        self.fields = list(fields)
+        self.names = [name for name, _ in self.fields]
+        self.text = [kind is str for _, kind in self.fields]
+        self.chunk = chunk
+        self.size = 0
+        self.columns = [np.empty(chunk, dtype=np.int8 if text else kind)
+                        for text, (_, kind) in zip(self.text, self.fields)]
+        # text columns: values in code order and value -> code
+        self.values = [[] if text else None for text in self.text]
+        self.codes = [{} if text else None for text in self.text]
+        self.pending = []
+
+    @classmethod
+    def from_records(cls, fields, records, chunk=4096):
+        """RecordLog holding records (dicts, or any row of the same fields)"""
+        log = cls(fields, chunk)
+        names = log.names
+        for record in records:
+            log.append(*(record[name] for name in names))
+        return log
+
+    def append(self, *row):
+        """Adds one row, values in field order"""
+        self.pending.append(row)
+        if len(self.pending) >= self.chunk:
+            self.flush()
+
+    def flush(self):
+        """Moves the buffered rows into the columns"""
+        if not self.pending:
+            return
+        n, m = self.size, len(self.pending)
+        if n + m > len(self.columns[0]):
+            capacity = max(2 * len(self.columns[0]), n + m)
+            self.columns = [np.resize(column, capacity) for column in self.columns]
+        for k, values in enumerate(zip(*self.pending)):
+            if self.text[k]:
+                codes = self.codes[k]
+                for value in values:
+                    if value not in codes:
+                        codes[value] = len(codes)
+                        self.values[k].append(value)
+                values = [codes[value] for value in values]
+                width = _code_dtype(len(codes))
+                if self.columns[k].dtype != width:
+                    self.columns[k] = self.columns[k].astype(width)
+            self.columns[k][n:n + m] = values
+        self.size = n + m
+        self.pending = []
+
+    def __len__(self):
+        return self.size + len(self.pending)
+
+    def _row(self, i):
+        if i >= self.size:
+            return tuple(value if self.text[k] else self.fields[k][1](value)
+                         for k, value in enumerate(self.pending[i - self.size]))
+        return tuple(self.values[k][column[i]] if self.text[k] else column[i].item()
+                     for k, column in enumerate(self.columns))
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("record index out of range")
+        return dict(zip(self.names, self._row(i)))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield dict(zip(self.names, self._row(i)))
+
+    def __eq__(self, other):
+        if isinstance(other, (RecordLog, list)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"RecordLog({len(self)} rows: {', '.join(self.names)})"
+
+    def column(self, name):
+        """Read-only view of one column (codes for a text column)"""
+        self.flush()
+        view = self.columns[self.names.index(name)][:self.size]
+        view.flags.writeable = False
+        return view
+
+    def to_frame(self):
+        """DataFrame over the columns without copying them (read-only, .copy() to edit)"""
+        self.flush()
+        data = {}
+        for k, name in enumerate(self.names):
+            view = self.column(name)
+            if self.text[k]:
+                view = pd.Categorical.from_codes(view, categories=self.values[k], validate=False)
+            data[name] = view
+        return pd.DataFrame(data, copy=False)
+
+
+class Lot:
+    __slots__ = ('shares', 'price', 'date')
+
+    def __init__(self, shares, price, date):
+        self.shares = shares
+        self.price = price
+        self.date = date
+
+    def __repr__(self):
+        return f"Lot({self.shares!r}, {self.price!r}, {self.date!r})"
+
+
+class LotBook:
+    def __init__(self):
+        # ticker id -> deque of Lot, oldest first, all on the same side
+        self.lots = {}
+
+    def fill(self, ticker_id, shares, price, date):
+        """
+        Applies one fill FIFO
+
+        Args:
+            ticker_id (int): portfolio ticker id
+            shares (float): signed fill (+ buy, - sell)
+            price (float): fill price
+            date (str): fill date
+
+        Returns:
+            (closed, opened): (Lot closed with its signed shares, ...) and the
+                              signed shares of the new lot (0 if none)
+        """
+        lots = self.lots.get(ticker_id)
+        closed = []
+        while shares and lots and (lots[0].shares > 0) != (shares > 0):
+            lot = lots[0]
+            if abs(lot.shares) <= abs(shares):
+                lots.popleft()
+                closed.append(lot)
+                shares += lot.shares
+            else:
+                closed.append(Lot(-shares, lot.price, lot.date))
+                lot.shares += shares
+                shares = 0
+        if shares:
+            if lots is None:
+                lots = self.lots[ticker_id] = collections.deque()
+            lots.append(Lot(shares, price, date))
+        return closed, shares
+
+    def open_lots(self, ticker_id):
+        return list(self.lots.get(ticker_id, ()))
+
+    def to_frame(self, tickers=None):
+        """One row per open lot: ticker (id, or name from tickers), entry_date, entry_price, shares"""
+        rows = [(tickers[i] if tickers is not None else i, lot.date, lot.price, lot.shares)
+                for i, lots in self.lots.items() for lot in lots]
+        return pd.DataFrame(rows, columns=['ticker', 'entry_date', 'entry_price', 'shares'])
@@ -0,0 +1,178 @@
+import json
+import os
+import queue
+import threading
+
+import numpy as np
+import pandas as pd
+
+"""
+Appendable binary results store
+    1) <path> ~ one binary file; each run appends a block of .npy arrays
+                (equity curve columns and labels, closed trade columns)
+    2) <path>.index ~ one JSON line per run: run_id, byte offset of each
+                      array, summary metrics and any extra info (strategy, period, ...)
+
+Loading a run reads its index line and seeks straight to its arrays, other
+runs are never read. The summary table comes from the index alone. Writing
+the same run_id again appends a new block, the latest one wins.
+
+BackgroundWriter moves serialization and disk writes onto a thread behind
+a bounded queue so a backtest never waits on I/O (unless the queue is full).
+"""
+
+
+def _columns(frame):
+    """DataFrame -> {column: numpy array}, text columns as fixed-width unicode"""
+    arrays = {}
+    for col in frame.columns:
+        values = frame[col].to_numpy()
+        if values.dtype.kind not in 'biuf':
+            values = values.astype(str)
+        arrays[str(col)] = values
+    return arrays
+
+
+class ResultsStore:
+    def __init__(self, path="results/runs.bin", reset=False):
+        """
+        Args:
+            path (str): data file, the index lives next to it at path + '.index'
+            reset (bool): start a new, empty store
+        """
+        self.path = path
+        self.index_path = path + ".index"
+        self._lock = threading.Lock()
+        if reset:
+            for p in (self.path, self.index_path):
+                if os.path.exists(p):
+                    os.remove(p)
+
+    def write(self, run_id, equity, trades=None, metrics=None, **info):
+        """
+        Appends one run
+
+        Args:
+            run_id (str): key the run is loaded by
+            equity (pd.DataFrame): equity curve / performance frame (index = dates)
+            trades (RecordLog, list or pd.DataFrame): closed trades
+            metrics (dict): summary metrics (ex. comp_performance output)
+            info: extra JSON-able fields stored in the index (strategy, period, params ...)
+        """
+        if hasattr(trades, 'to_frame'):
+            trades = trades.to_frame()
+        trades = pd.DataFrame(trades if trades is not None else [])
+        arrays = {'equity.__index__': np.asarray(equity.index).astype(str)}
+        arrays.update({f'equity.{c}': a for c, a in _columns(equity).items()})
+        arrays.update({f'trades.{c}': a for c, a in _columns(trades).items()})
+
+        with self._lock:
+            offsets = {}
+            with open(self.path, "ab") as f:
+                for name, array in arrays.items():
+                    offsets[name] = f.tell()
+                    np.save(f, array, allow_pickle=False)
+            entry = {'run_id': run_id,
+                     'offsets': offsets,
+                     'equity_columns': [str(c) for c in equity.columns],
+                     'trade_columns': [str(c) for c in trades.columns],
+                     'metrics': {k: _jsonable(v) for k, v in (metrics or {}).items()},
+                     'info': {k: _jsonable(v) for k, v in info.items()}}
+            with open(self.index_path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def _index(self):
+        entries = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                for line in f:
+                    entry = json.loads(line)
+                    entries[entry['run_id']] = entry
+        return entries
+
+    def run_ids(self):
+        return list(self._index())
+
+    def summary(self):
+        """One row per run: run_id, info fields and metrics (read from the index only)"""
+        rows = [{'run_id': e['run_id'], **e['info'], **e['metrics']} for e in self._index().values()]
+        return pd.DataFrame(rows)
+
+    def load(self, run_id):
+        """
+        Returns (equity DataFrame, trades DataFrame, metrics dict) for one run
+        """
+        entry = self._index()[run_id]
+        offsets = entry['offsets']
+        with open(self.path, "rb") as f:
+            def read(name):
+                f.seek(offsets[name])
+                return np.load(f, allow_pickle=False)
+
+            equity = pd.DataFrame({c: read(f'equity.{c}') for c in entry['equity_columns']},
+                                  index=read('equity.__index__').tolist())
+            trades = pd.DataFrame({c: read(f'trades.{c}') for c in entry['trade_columns']})
+        return equity, trades, entry['metrics']
+
+    def writer(self, maxsize=64):
+        """BackgroundWriter appending to this store"""
+        return BackgroundWriter(self, maxsize)
+
+
+class BackgroundWriter:
+    def __init__(self, store, maxsize=64):
+        """
+        Writes runs to store on a background thread
+
+        Args:
+            store (ResultsStore): where runs go
+            maxsize (int): runs queued before submit blocks
+        """
+        self.store = store
+        self.queue = queue.Queue(maxsize)
+        self.error = None
+        self.thread = threading.Thread(target=self._work, daemon=True)
+        self.thread.start()
+
+    def _work(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            args, kwargs = item
+            try:
+                self.store.write(*args, **kwargs)
+            except Exception as e:
+                self.error = e
+
+    def submit(self, run_id, equity, trades=None, metrics=None, **info):
+        """Queues a run for writing (same arguments as ResultsStore.write)"""
+        if self.error is not None:
+            raise self.error
+        self.queue.put(((run_id, equity, trades, metrics), info))
+
+    def close(self):
+        """Waits for every queued run to be written"""
+        self.queue.put(None)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+            return
+        # still write what was queued, but let the body's exception propagate
+        self.queue.put(None)
+        self.thread.join()
+
+
+def _jsonable(value):
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and value != value:
+        return None
+    return value
@@ -0,0 +1,229 @@
+import argparse
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+
+from backtester.records import RecordLog, column
+
+"""
+Monte Carlo robustness of a finished run
+    1) resample_returns ~ resamples the daily returns (bootstrap, block
+                          bootstrap or shuffle) into many alternative equity
+                          paths: final equity, max drawdown and Sharpe of each
+    2) resample_trades ~ resamples the closed trades' pnl (bootstrap or
+                         shuffle) into trade-by-trade equity paths: final
+                         equity, max drawdown and win rate of each
+    3) confidence ~ mean, std and the confidence interval of every metric,
+                    next to the observed value
+
+Resamples are drawn chunk by chunk as (paths x bars) matrices, chunk sized
+so a matrix stays around budget elements, and every chunk has its own seed
+(spawned from seed), so the result depends on seed and n only: the same
+with processes=None (one process) as spread over a process pool.
+"""
+
+RETURN_METHODS = ('bootstrap', 'block', 'shuffle')
+TRADE_METHODS = ('bootstrap', 'shuffle')
+RETURN_METRICS = ['Final Equity', 'Max Drawdown', 'Sharpe']
+TRADE_METRICS = ['Final Equity', 'Max Drawdown', 'Win Rate']
+BUDGET = 2**22
+
+
+def _indices(rng, size, length, method, block):
+    """size x length resample positions into a series of length values"""
+    if method == 'bootstrap':
+        return rng.integers(0, length, (size, length))
+    if method == 'shuffle':
+        return rng.permuted(np.tile(np.arange(length), (size, 1)), axis=1)
+    # circular block bootstrap
+    blocks = -(-length // block)
+    starts = rng.integers(0, length, (size, blocks))
+    return ((starts[:, :, None] + np.arange(block)) % length).reshape(size, -1)[:, :length]
+
+
+def _max_drawdown(equity, start):
+    peak = np.maximum(np.maximum.accumulate(equity, axis=1), start)
+    return np.minimum(((equity - peak) / peak).min(axis=1), 0.0)
+
+
+def _returns_metrics(paths, start_cash):
+    """Final equity, max drawdown and Sharpe of every row of daily returns"""
+    equity = start_cash * np.cumprod(1 + paths, axis=1)
+    mean = paths.mean(axis=1)
+    std = paths.std(axis=1, ddof=1) if paths.shape[1] > 1 else np.full(len(paths), np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.where(std > 0, mean / std * (252 ** 0.5), np.nan)
+    return np.column_stack([equity[:, -1], _max_drawdown(equity, start_cash), sharpe])
+
+
+def _trades_metrics(paths, start_cash):
+    """Final equity, max drawdown and win rate of every row of trade pnl"""
+    equity = start_cash + np.cumsum(paths, axis=1)
+    return np.column_stack([equity[:, -1], _max_drawdown(equity, start_cash), (paths > 0).mean(axis=1)])
+
+
+def _returns_chunk(task):
+    returns, size, method, block, start_cash, seed = task
+    rng = np.random.default_rng(seed)
+    return _returns_metrics(returns[_indices(rng, size, len(returns), method, block)], start_cash)
+
+
+def _trades_chunk(task):
+    pnl, size, method, _, start_cash, seed = task
+    rng = np.random.default_rng(seed)
+    return _trades_metrics(pnl[_indices(rng, size, len(pnl), method, None)], start_cash)
+
+
+def _resample(fn, values, n, method, block, start_cash, seed, processes, budget):
+    size = max(1, budget // max(len(values), 1))
+    seeds = np.random.SeedSequence(seed).spawn(-(-n // size))
+    tasks = [(values, min(size, n - i * size), method, block, start_cash, s) for i, s in enumerate(seeds)]
+    if processes and processes > 1 and len(tasks) > 1:
+        with Pool(processes) as pool:
+            chunks = pool.map(fn, tasks)
+    else:
+        chunks = [fn(task) for task in tasks]
+    return np.vstack(chunks)
+
+
+def resample_returns(returns, n=10000, method='bootstrap', block=20, start_cash=10000, seed=0,
+                     processes=None, budget=BUDGET):
+    """
+    Equity paths built from resampled daily returns
+
+    Args:
+        returns (array-like): daily returns (ex. performance['Daily_Return']), NaNs dropped
+        n (int): number of paths
+        method (str): 'bootstrap' (with replacement), 'block' (circular blocks
+                      of block days, keeps short-term autocorrelation) or
+                      'shuffle' (same returns, new order)
+        block (int): block length for 'block'
+        start_cash (float): equity every path starts from
+        seed (int): random seed
+        processes (int): spread the chunks over this many processes (one process when None)
+        budget (int): elements per chunk matrix, bounds memory
+
+    Returns:
+        pd.DataFrame: n rows, RETURN_METRICS columns (the actual sequence's
+                      values in attrs['observed'])
+    """
+    if method not in RETURN_METHODS:
+        raise ValueError(f"unknown method {method!r}, expected one of {RETURN_METHODS}")
+    returns = np.asarray(returns, dtype=float)
+    returns = returns[~np.isnan(returns)]
+    if not len(returns):
+        raise ValueError("no returns to resample")
+    samples = _resample(_returns_chunk, returns, n, method, block, start_cash, seed, processes, budget)
+    samples = pd.DataFrame(samples, columns=RETURN_METRICS)
+    samples.attrs['observed'] = dict(zip(RETURN_METRICS, _returns_metrics(returns[None], start_cash)[0]))
+    return samples
+
+
+def resample_trades(closed_trades, n=10000, method='bootstrap', start_cash=10000, seed=0,
+                    processes=None, budget=BUDGET):
+    """
+    Trade-by-trade equity paths built from resampled closed trade pnl
+
+    Args:
+        closed_trades (RecordLog, list or pd.DataFrame): Portfolio.closed_trades (or just the pnl values)
+        n, start_cash, seed, processes, budget: see resample_returns
+        method (str): 'bootstrap' (with replacement) or 'shuffle' (same trades, new order)
+
+    Returns:
+        pd.DataFrame: n rows, TRADE_METRICS columns (the actual sequence's
+                      values in attrs['observed'])
+    """
+    if method not in TRADE_METHODS:
+        raise ValueError(f"unknown method {method!r}, expected one of {TRADE_METHODS}")
+    pnl = np.asarray(_pnl(closed_trades), dtype=float)
+    if not len(pnl):
+        raise ValueError("no closed trades to resample")
+    samples = _resample(_trades_chunk, pnl, n, method, None, start_cash, seed, processes, budget)
+    samples = pd.DataFrame(samples, columns=TRADE_METRICS)
+    samples.attrs['observed'] = dict(zip(TRADE_METRICS, _trades_metrics(pnl[None], start_cash)[0]))
+    return samples
+
+
+def _pnl(closed_trades):
+    if isinstance(closed_trades, (RecordLog, pd.DataFrame)):
+        return column(closed_trades, 'pnl')
+    return [t['pnl'] if isinstance(t, dict) else t for t in closed_trades]
+
+
+def confidence(samples, ci=0.95, observed=None):
+    """
+    Summary of resampled metrics
+
+    Args:
+        samples (pd.DataFrame): output of resample_returns / resample_trades
+        ci (float): confidence level of the interval
+        observed (dict or pd.Series): metric values of the actual run, shown
+                                      alongside (defaults to samples.attrs['observed'])
+
+    Returns:
+        pd.DataFrame: one row per metric: observed, mean, std, lower, median, upper
+    """
+    if observed is None:
+        observed = samples.attrs.get('observed')
+    tail = (1 - ci) / 2
+    table = pd.DataFrame({
+        'mean': samples.mean(),
+        'std': samples.std(),
+        'lower': samples.quantile(tail),
+        'median': samples.median(),
+        'upper': samples.quantile(1 - tail),
+    })
+    if observed is not None:
+        table.insert(0, 'observed', pd.Series(observed).reindex(table.index))
+    return table
+
+
+def robustness(performance, closed_trades, n=10000, ci=0.95, start_cash=None, seed=0, processes=None,
+               return_method='bootstrap', trade_method='bootstrap', block=20):
+    """
+    Confidence tables for one finished run
+
+    Args:
+        performance (pd.DataFrame): BTE.build_results output (Portfolio_value, Daily_Return)
+        closed_trades (list): Portfolio.closed_trades
+        start_cash (float): defaults to the run's first portfolio value
+
+    Returns:
+        dict: 'returns' and (when the run closed any trades) 'trades' -> confidence table
+    """
+    if start_cash is None:
+        start_cash = performance['Portfolio_value'].iloc[0]
+    tables = {'returns': confidence(resample_returns(performance['Daily_Return'], n, return_method, block,
+                                                     start_cash, seed, processes), ci)}
+    if len(closed_trades):
+        tables['trades'] = confidence(resample_trades(closed_trades, n, trade_method, start_cash, seed,
+                                                      processes), ci)
+    return tables
+
+
+def main(argv=None):
+    from backtester.results_store import ResultsStore
+
+    parser = argparse.ArgumentParser(description="Monte Carlo robustness of a stored run")
+    parser.add_argument("run_id", help="run in the results store, ex. TrendFollowing_full")
+    parser.add_argument("--store", default="results/runs.bin")
+    parser.add_argument("-n", type=int, default=10000, help="resamples")
+    parser.add_argument("--ci", type=float, default=0.95)
+    parser.add_argument("--returns", choices=RETURN_METHODS, default='bootstrap')
+    parser.add_argument("--trades", choices=TRADE_METHODS, default='bootstrap')
+    parser.add_argument("--block", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    performance, trades, _ = ResultsStore(args.store).load(args.run_id)
+    tables = robustness(performance, trades, args.n, args.ci, seed=args.seed, processes=args.processes,
+                        return_method=args.returns, trade_method=args.trades, block=args.block)
+    for name, table in tables.items():
+        print(f"\n{args.run_id} - resampled {name} ({args.n} paths, {args.ci:.0%} interval)")
+        print(table.to_string(float_format=lambda v: f"{v:,.4f}"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import copy
+
+import pandas as pd
+
+from backtester.datastore import get_store
+from backtester.engine import BTE
+from backtester.feed import FrameFeed
+from backtester.portfolio import Portfolio
+
+"""
+Single-pass runner for many (strategy, portfolio) pairs
+    1) one feed is read once per run, each bar's prices are extracted once
+    2) every pair gets that bar through its own BTE.step, so equity curves,
+       trades and closed_trades stay separate per pair
+    3) strategies built with the same IndicatorSet (see indicators.py) share
+       their moving averages, so each one is computed once per bar
+    4) warm_starts ~ strategies warmed up for several period starts from one
+                     pass over the data (see BTE.warm_up)
+"""
+
+
+class MultiRunner:
+    def __init__(self, pairs, data=None):
+        """
+        Args:
+            pairs (list): (strategy, portfolio) pairs
+            data: closing price DataFrame or bar feed, the shared market data
+                  cache when not given
+        """
+        if data is None:
+            data = get_store().close_frame()
+        self.feed = FrameFeed(data) if isinstance(data, pd.DataFrame) else data
+        self.engines = [BTE(portfolio, strategy, data=self.feed) for strategy, portfolio in pairs]
+
+    def run(self, start_date=None, end_date=None):
+        """
+        Runs every pair over one pass of the data
+
+        Returns:
+            list: one performance frame (BTE.build_results) per pair, in pair order
+        """
+        for engine in self.engines:
+            if len(engine.portfolio.ledger) == 0:
+                engine.portfolio.record_equity(date='START')
+
+        # pairs restored from checkpoints may already be at different dates
+        last_dates = [engine.last_date for engine in self.engines]
+        after = None if None in last_dates else min(last_dates)
+
+        instrumented = [engine.instrument for engine in self.engines if engine.instrument is not None]
+        for inst in instrumented:
+            inst.start()
+        try:
+            for dates, prices in self.feed.chunks(start_date, end_date, after=after):
+                for date, row in zip(dates, prices):
+                    for engine, last in zip(self.engines, last_dates):
+                        if last is None or date > last:
+                            engine.step(date, row)
+        finally:
+            for inst in instrumented:
+                inst.stop()
+
+        return [engine.build_results() for engine in self.engines]
+
+
+def warm_starts(strategies, starts, data=None):
+    """
+    Strategies warmed up to several period starts in one pass over the data
+
+    The strategies see every bar once, in date order, and a copy of them is
+    taken (then flattened) as each start is reached. A copy is in the state
+    BTE.warm_up(start) with bars=None would have left a fresh strategy in,
+    so each period's run starts warm without reading its history again.
+
+    Args:
+        strategies (list): fresh strategies, built with one IndicatorSet to share their indicators
+        starts (list): period start dates (None, the start of the data, gets cold copies)
+        data: closing price DataFrame or bar feed, the shared market data
+              cache when not given
+
+    Returns:
+        dict: start -> copies of strategies (in order) warmed on every bar before start
+    """
+    if data is None:
+        data = get_store().close_frame()
+    feed = FrameFeed(data) if isinstance(data, pd.DataFrame) else data
+    engines = [BTE(Portfolio(), strategy, data=feed) for strategy in strategies]
+
+    def snapshot():
+        copies = copy.deepcopy(strategies)
+        for strategy in copies:
+            strategy.flatten()
+        return copies
+
+    pending = sorted({start for start in starts if start})
+    warm = {None: snapshot()} if None in starts else {}
+    if pending:
+        for dates, prices in feed.chunks(end_date=pending[-1]):
+            for date, row in zip(dates, prices):
+                while pending and date >= pending[0]:
+                    warm[pending.pop(0)] = snapshot()
+                if not pending:
+                    break
+                for engine in engines:
+                    engine._prime(row)
+    # starts after the last bar
+    for start in pending:
+        warm[start] = snapshot()
+    return warm
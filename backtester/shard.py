@@ -0,0 +1,162 @@
+import os
+from multiprocessing import Pool, shared_memory
+
+import numpy as np
+import pandas as pd
+
+from backtester.datastore import get_store
+from backtester.engine import BTE
+from backtester.feed import ArrayFeed
+from backtester.portfolio import Portfolio
+from backtester.records import ROUND_TRIP_FIELDS, TRADE_FIELDS, RecordLog
+
+"""
+Sharded backtests: one universe split across worker processes
+    1) the price matrix is copied into multiprocessing.shared_memory once,
+       workers map it and read their tickers' columns as a view (no copies)
+    2) each worker runs its own BTE (own strategy, own sub-portfolio) on a
+       contiguous slice of tickers
+    3) the shards' positions, trades, closed trades and open lots are merged
+       into one Portfolio, in the order a single-process run would have
+       produced them
+
+Cash sharing
+    cash='exact' ~ shards trade with unlimited cash, then the merged cash is
+                   replayed trade by trade in single-process order (date, then
+                   ticker column) from start_cash. For a ticker-independent
+                   strategy (a ticker's signals only depend on its own prices)
+                   the result is identical to run_backtest on the whole
+                   universe. If the replay reaches a buy the shared cash can't
+                   cover, the single-process run would have rejected it and
+                   diverged, so a ValueError is raised instead.
+    cash='split' ~ start_cash is split over the shards in proportion to their
+                   number of tickers and each shard only spends its own cash
+                   (no cash moves between shards). Always runs, but a buy a
+                   shared pool could have paid for may be rejected.
+"""
+
+CASH_MODES = ('exact', 'split')
+
+_shared = None
+
+
+def _init_worker(name, shape, dates):
+    global _shared
+    shm = shared_memory.SharedMemory(name=name)
+    _shared = (shm, dates, np.ndarray(shape, dtype=float, buffer=shm.buf))
+
+
+def _run_shard(task):
+    strategy_class, params, tickers, columns, start_date, end_date, shard_cash = task
+    _, dates, prices = _shared
+    portfolio = Portfolio(start_cash=shard_cash)
+    engine = BTE(portfolio, strategy_class(**params), data=ArrayFeed(dates, prices[:, columns], tickers))
+    engine.run_backtest(start_date=start_date, end_date=end_date)
+    n = len(portfolio.ledger)
+    return {
+        'labels': portfolio.ledger.labels,
+        'cash': portfolio.ledger.cash[:n].copy(),
+        'positions': portfolio.ledger.positions[:n].copy(),
+        'cost_basis': portfolio.cost_basis,
+        'trades': portfolio.trades,
+        'closed_trades': portfolio.closed_trades,
+        'tickers': portfolio.tickers,
+        'lots': portfolio.lots.lots,
+    }
+
+
+def _replay_cash(trades, labels, start_cash):
+    """Cash after every bar, spending and receiving trade notionals in order"""
+    bar = {label: i for i, label in enumerate(labels)}
+    cash = np.full(len(labels), np.nan)
+    cash[0] = start_cash
+    balance = start_cash
+    for trade in trades:
+        if trade['action'] == "BUY":
+            if balance < trade['notional']:
+                raise ValueError(f"shared cash can't cover the {trade['ticker']} buy on {trade['date']}, "
+                                 "the shards are not independent (use cash='split')")
+            balance -= trade['notional']
+        else:
+            balance += trade['notional']
+        cash[bar[trade['date']]] = balance
+    return pd.Series(cash).ffill().to_numpy()
+
+
+def run_sharded(strategy_class, params=None, data=None, start_date=None, end_date=None,
+                start_cash=10000, shards=None, cash='exact'):
+    """
+    Runs one strategy over the universe split into shards, one process each
+
+    Args:
+        strategy_class: strategy to run, built with params in every shard
+        params (dict): strategy parameters
+        data (pd.DataFrame): closing prices, the market data cache when not given
+        start_date (str): first bar, None for the start of the data
+        end_date (str): last bar, None for the end of the data
+        start_cash (float): cash of the merged portfolio
+        shards (int): number of shards (and processes), one per core when None
+        cash (str): 'exact' or 'split', see the module notes
+
+    Returns:
+        (BTE, pd.DataFrame): an engine holding the merged portfolio, and its
+                             performance frame (as BTE.build_results)
+    """
+    if cash not in CASH_MODES:
+        raise ValueError(f"unknown cash mode {cash!r}, expected one of {CASH_MODES}")
+    params = params or {}
+    if data is None:
+        data = get_store().close_frame()
+    tickers = list(data.columns)
+    dates = np.asarray(data.index).astype(str)
+    shards = max(1, min(shards or os.cpu_count() or 1, len(tickers)))
+    bounds = np.linspace(0, len(tickers), shards + 1).astype(int)
+
+    shape = (len(dates), len(tickers))
+    shm = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * 8, 1))
+    try:
+        np.ndarray(shape, dtype=float, buffer=shm.buf)[:] = data.to_numpy(dtype=float)
+        tasks = []
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            shard_cash = float('inf') if cash == 'exact' else start_cash * (hi - lo) / len(tickers)
+            tasks.append((strategy_class, params, tickers[lo:hi], slice(lo, hi), start_date, end_date, shard_cash))
+        with Pool(shards, initializer=_init_worker, initargs=(shm.name, shape, dates)) as pool:
+            results = pool.map(_run_shard, tasks)
+        prices = np.ndarray(shape, dtype=float, buffer=shm.buf).copy()
+    finally:
+        shm.close()
+        shm.unlink()
+
+    # trades in single-process order: bar, then ticker column (stable within a ticker)
+    labels = results[0]['labels']
+    bar = {label: i for i, label in enumerate(labels)}
+    column = {ticker: j for j, ticker in enumerate(tickers)}
+    trades = RecordLog.from_records(TRADE_FIELDS, sorted(
+        (t for r in results for t in r['trades']), key=lambda t: (bar[t['date']], column[t['ticker']])))
+    closed_trades = RecordLog.from_records(ROUND_TRIP_FIELDS, sorted(
+        (t for r in results for t in r['closed_trades']), key=lambda t: (bar[t['exit_date']], column[t['ticker']])))
+
+    positions = np.hstack([r['positions'] for r in results])
+    if cash == 'exact':
+        cash_curve = _replay_cash(trades, labels, start_cash)
+    else:
+        cash_curve = np.sum([r['cash'] for r in results], axis=0)
+    rows = np.searchsorted(dates, labels[1:])
+    value = np.empty(len(labels))
+    value[0] = cash_curve[0]
+    value[1:] = cash_curve[1:] + (positions[1:] * prices[rows]).sum(axis=1)
+
+    portfolio = Portfolio(start_cash=start_cash, tickers=tickers)
+    portfolio.cash = cash_curve[-1]
+    portfolio.shares = positions[-1].copy()
+    portfolio.cost_basis = np.concatenate([r['cost_basis'] for r in results])
+    portfolio.portfolio_value = value[-1]
+    portfolio.trades = trades
+    portfolio.closed_trades = closed_trades
+    for r in results:
+        for i, lots in r['lots'].items():
+            portfolio.lots.lots[column[r['tickers'][i]]] = lots
+    portfolio.ledger.extend(labels, cash_curve, value, positions)
+
+    engine = BTE(portfolio, strategy_class(**params), data=data)
+    return engine, engine.build_results()
@@ -1,8 +1,77 @@
+import numpy as np
 import pandas as pd
-from collections import deque
+from backtester.indicators import IndicatorSet
+from backtester.records import Signal
+
+"""
+Strategies implement two interfaces
+    1) process_day(ticker, close) ~ one ticker at a time, signals appended to
+                                    self.signals as records.Signal(ticker, action, quantity)
+    2) process_bar(closes) ~ the whole bar at once (closes of every ticker in
+                             data column order), state kept as arrays, returns
+                             orders as arrays (ticker_ids, sides, quantities)
+                             with side 1 = BUY, -1 = SELL
+BTE uses process_bar when a strategy has it. Both give the same signals in
+the same (ticker) order, process_bar costs a few vector operations per bar
+instead of one Python call per ticker.
+
+Warm starts (BTE.warm_up) feed a strategy bars from before its run, then
+call flatten() to forget the positions those bars would have opened, so
+only the indicators carry over. signal_matrix(prices, warmup) does the same
+for the vectorized engine: the first warmup rows only feed the averages.
+"""
+
+NO_ORDERS = (np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.int8), np.zeros(0, dtype=int))
+
+
+def bar_orders(buy, sell, quantity):
+    """
+    Builds process_bar orders from boolean buy/sell vectors
+
+    Returns:
+        (ticker_ids, sides, quantities) in ticker order
+    """
+    ticker_ids = np.flatnonzero(buy | sell)
+    if not len(ticker_ids):
+        return NO_ORDERS
+    sides = np.where(buy[ticker_ids], 1, -1).astype(np.int8)
+    return ticker_ids, sides, np.full(len(ticker_ids), quantity)
+
+
+def rolling_mean(prices, window):
+    """
+    Trailing moving average of every column of a days x tickers price matrix
+
+    Uses the same running sum as indicators.SMA so results match the
+    event-driven strategies exactly: every window rows (the first full
+    window, then each window after it) the total is re-summed
+    oldest-to-newest, in between total += new - old. Rows before the
+    window fills are NaN.
+
+    Args:
+        prices (np.ndarray): days x tickers closing prices
+        window (int): number of periods in the average
+    """
+    n = len(prices)
+    means = np.full(prices.shape, np.nan)
+    if n >= window:
+        # one block per re-sum: its first row is the window sum, the rest new - old steps
+        rows = n - window + 1
+        blocks = -(-rows // window)
+        steps = np.zeros((blocks * window,) + prices.shape[1:])
+        steps[1:rows] = prices[window:] - prices[:n - window]
+        anchors = np.arange(window - 1, n, window)
+        total = 0 + prices[anchors - window + 1]
+        for k in range(1, window):
+            total = total + prices[anchors - window + 1 + k]
+        steps[::window] = total
+        totals = np.cumsum(steps.reshape((blocks, window) + prices.shape[1:]), axis=1)
+        means[window - 1:] = totals.reshape(steps.shape)[:rows] / window
+    return means
+
 
 class TrendFollowing:
-    def __init__(self, short_window=5, long_window=20, position_size=10):
+    def __init__(self, short_window=5, long_window=20, position_size=10, indicators=None):
         """
         Initializes trend following strategy 
 
@@ -10,13 +79,17 @@ class TrendFollowing:
             short_window (int): Number of periods for short-term MA 
             long_window (int): Number of periods for long-term MA
             position_size (int): Number of shares per trade
+            indicators (IndicatorSet): shared indicators, pass the same set to
+                                       strategies on one feed to compute each MA once
         """
 
         self.short_window = short_window 
         self.long_window = long_window 
         self.position_size = position_size 
+        self.indicators = indicators if indicators is not None else IndicatorSet()
 
         self.ticker_state = {}
+        self.bar_state = None
 
         self.signals = []
 
@@ -31,40 +104,99 @@ class TrendFollowing:
 
         if ticker not in self.ticker_state:
             self.ticker_state[ticker] = {
-                'prices': deque(maxlen=self.long_window),
+                'short_ma': self.indicators.get(ticker, 'sma', self.short_window),
+                'long_ma': self.indicators.get(ticker, 'sma', self.long_window),
+                'bar': 0,
                 'in_position': False 
             }
 
         state = self.ticker_state[ticker]
-        state['prices'].append(close)
-
-        if len(state['prices']) >= self.long_window:
-            prices_list = list(state['prices'])
+        state['bar'] += 1
+        state['short_ma'].update(close, state['bar'])
+        state['long_ma'].update(close, state['bar'])
 
-            short_ma = sum(prices_list[-self.short_window:]) / self.short_window 
-            long_ma = sum(prices_list) / self.long_window 
+        if state['long_ma'].ready and state['short_ma'].ready:
+            short_ma = state['short_ma'].value
+            long_ma = state['long_ma'].value
 
             if short_ma > long_ma and not state['in_position']:
-                signal = {
-                    "ticker": ticker,
-                    "action": "BUY", 
-                    "quantity": self.position_size
-                }
+                signal = Signal(ticker, "BUY", self.position_size)
                 self.signals.append(signal)
                 state['in_position'] = True 
 
             elif short_ma < long_ma and state['in_position']:
-                signal = {
-                    "ticker": ticker, 
-                    "action": "SELL", 
-                    "quantity": self.position_size 
-                }
+                signal = Signal(ticker, "SELL", self.position_size)
                 self.signals.append(signal)
                 state['in_position'] = False 
 
+    def flatten(self):
+        """Every ticker back to no position, indicators kept (see BTE.warm_up)"""
+        for state in self.ticker_state.values():
+            state['in_position'] = False
+        if self.bar_state is not None:
+            self.bar_state['in_position'][:] = False
+        self.signals = []
+
+    def process_bar(self, close):
+        """
+        Feeds one bar of every ticker to the strategy
+
+        Args:
+            close (np.ndarray): closing price of every ticker
+
+        Returns:
+            (ticker_ids, sides, quantities): orders, see bar_orders
+        """
+        if self.bar_state is None:
+            width = len(close)
+            self.bar_state = {
+                'short_ma': self.indicators.get_vector('sma', self.short_window, width),
+                'long_ma': self.indicators.get_vector('sma', self.long_window, width),
+                'bar': 0,
+                'in_position': np.zeros(width, dtype=bool)
+            }
+
+        state = self.bar_state
+        state['bar'] += 1
+        state['short_ma'].update(close, state['bar'])
+        state['long_ma'].update(close, state['bar'])
+        if not (state['long_ma'].ready and state['short_ma'].ready):
+            return NO_ORDERS
+
+        short_ma = state['short_ma'].value
+        long_ma = state['long_ma'].value
+        in_position = state['in_position']
+        buy = (short_ma > long_ma) & ~in_position
+        sell = (short_ma < long_ma) & in_position
+        in_position[buy] = True
+        in_position[sell] = False
+        return bar_orders(buy, sell, self.position_size)
+
+    def signal_matrix(self, prices, warmup=0):
+        """
+        Generates every signal for a whole price history at once
+
+        Args:
+            prices (np.ndarray): days x tickers closing prices
+            warmup (int): leading rows that only feed the moving averages
+                          (no signals, flat at the first row after them)
+
+        Returns:
+            np.ndarray: (days - warmup) x tickers, 1 = BUY, -1 = SELL, 0 = no signal
+                        (each for position_size shares)
+        """
+        long_ma = rolling_mean(prices, self.long_window)[warmup:]
+        short_ma = rolling_mean(prices, self.short_window)[warmup:]
+
+        state = np.full(long_ma.shape, np.nan)
+        state[short_ma > long_ma] = 1
+        state[short_ma < long_ma] = 0
+        in_position = pd.DataFrame(state).ffill().fillna(0).to_numpy()
+        return np.diff(in_position, axis=0, prepend=0).astype(np.int8)
+
         
 class MeanReversion:
-    def __init__(self, mean_window=20, threshold_pct=0.02, position_size=10):
+    def __init__(self, mean_window=20, threshold_pct=0.02, position_size=10, indicators=None):
         """"
         Initializes mean reveresion strategy
 
@@ -72,13 +204,17 @@ class MeanReversion:
             mean_window (int): number of period for moving average 
             threshold_pct (flaot): percentage distance from mean to trigger entry 
             position_size (int): number of shares per trade
+            indicators (IndicatorSet): shared indicators, pass the same set to
+                                       strategies on one feed to compute each MA once
         """
 
         self.mean_window = mean_window 
         self.threshold_pct = threshold_pct 
         self.position_size = position_size 
+        self.indicators = indicators if indicators is not None else IndicatorSet()
 
         self.ticker_state = {}
+        self.bar_state = None
         self.signals = []
 
     def process_day(self, ticker, close):
@@ -92,17 +228,18 @@ class MeanReversion:
 
         if ticker not in self.ticker_state:
             self.ticker_state[ticker] = {
-                'prices': deque(maxlen=self.mean_window),
+                'mean': self.indicators.get(ticker, 'sma', self.mean_window),
+                'bar': 0,
                 'in_position': False,
                 'position_type': None
             }
         
         state = self.ticker_state[ticker]
-        state['prices'].append(close)
+        state['bar'] += 1
+        state['mean'].update(close, state['bar'])
 
-        if len(state['prices']) >= self.mean_window:
-            prices_list = list(state['prices'])
-            mean = sum(prices_list) / self.mean_window
+        if state['mean'].ready:
+            mean = state['mean'].value
 
             upper_band = mean * (1 + self.threshold_pct)
             lower_band = mean * (1 - self.threshold_pct)
@@ -110,21 +247,13 @@ class MeanReversion:
             if not state['in_position']:
 
                 if close < lower_band:
-                    signal = {
-                        "ticker": ticker,
-                        "action": "BUY",
-                        "quantity": self.position_size
-                    }
+                    signal = Signal(ticker, "BUY", self.position_size)
                     self.signals.append(signal)
                     state['in_position'] = True
                     state['position_type'] = "LONG"
 
                 elif close > upper_band:
-                    signal = {
-                        "ticker": ticker,
-                        "action": "SELL",
-                        "quantity": self.position_size
-                    }
+                    signal = Signal(ticker, "SELL", self.position_size)
                     self.signals.append(signal)
                     state['in_position'] = True
                     state['position_type'] = "SHORT"
@@ -132,23 +261,99 @@ class MeanReversion:
             else:
 
                 if state['position_type'] == "LONG" and close >= mean:
-                    signal = {
-                        "ticker": ticker,
-                        "action": "SELL",
-                        "quantity": self.position_size
-                    }
+                    signal = Signal(ticker, "SELL", self.position_size)
                     self.signals.append(signal)
                     state['in_position'] = False
                     state['position_type'] = None
 
                 elif state['position_type'] == "SHORT" and close <= mean:
-                    signal = {
-                        "ticker": ticker,
-                        "action": "BUY",
-                        "quantity": self.position_size
-                    }
+                    signal = Signal(ticker, "BUY", self.position_size)
                     self.signals.append(signal)
                     state['in_position'] = False
                     state['position_type'] = None
 
+    def flatten(self):
+        """Every ticker back to no position, indicators kept (see BTE.warm_up)"""
+        for state in self.ticker_state.values():
+            state['in_position'] = False
+            state['position_type'] = None
+        if self.bar_state is not None:
+            self.bar_state['position_type'][:] = 0
+        self.signals = []
+
+    def process_bar(self, close):
+        """
+        Feeds one bar of every ticker to the strategy
+
+        Args:
+            close (np.ndarray): closing price of every ticker
+
+        Returns:
+            (ticker_ids, sides, quantities): orders, see bar_orders
+        """
+        if self.bar_state is None:
+            width = len(close)
+            self.bar_state = {
+                'mean': self.indicators.get_vector('sma', self.mean_window, width),
+                'bar': 0,
+                # 1 = LONG, -1 = SHORT, 0 = flat
+                'position_type': np.zeros(width, dtype=np.int8)
+            }
+
+        state = self.bar_state
+        state['bar'] += 1
+        state['mean'].update(close, state['bar'])
+        if not state['mean'].ready:
+            return NO_ORDERS
+
+        mean = state['mean'].value
+        position_type = state['position_type']
+        flat = position_type == 0
+        enter_long = flat & (close < mean * (1 - self.threshold_pct))
+        enter_short = flat & ~enter_long & (close > mean * (1 + self.threshold_pct))
+        exit_long = (position_type == 1) & (close >= mean)
+        exit_short = (position_type == -1) & (close <= mean)
+
+        position_type[enter_long] = 1
+        position_type[enter_short] = -1
+        position_type[exit_long | exit_short] = 0
+        return bar_orders(enter_long | exit_short, enter_short | exit_long, self.position_size)
+
+    def signal_matrix(self, prices, warmup=0):
+        """
+        Generates every signal for a whole price history at once
+
+        Moving averages are computed for all days in one pass, then the
+        LONG/SHORT/flat state of every ticker is stepped forward one day at a time
+
+        Args:
+            prices (np.ndarray): days x tickers closing prices
+            warmup (int): leading rows that only feed the moving average
+                          (no signals, flat at the first row after them)
+
+        Returns:
+            np.ndarray: (days - warmup) x tickers, 1 = BUY, -1 = SELL, 0 = no signal
+                        (each for position_size shares)
+        """
+        mean = rolling_mean(prices, self.mean_window)[warmup:]
+        prices = prices[warmup:]
+        upper_band = mean * (1 + self.threshold_pct)
+        lower_band = mean * (1 - self.threshold_pct)
+
+        signals = np.zeros(prices.shape, dtype=np.int8)
+        # 1 = LONG, -1 = SHORT, 0 = flat
+        position_type = np.zeros(prices.shape[1], dtype=np.int8)
+        for t in range(max(self.mean_window - 1 - warmup, 0), len(prices)):
+            close = prices[t]
+            flat = position_type == 0
+            enter_long = flat & (close < lower_band[t])
+            enter_short = flat & ~enter_long & (close > upper_band[t])
+            exit_long = (position_type == 1) & (close >= mean[t])
+            exit_short = (position_type == -1) & (close <= mean[t])
 
+            signals[t, enter_long | exit_short] = 1
+            signals[t, enter_short | exit_long] = -1
+            position_type[enter_long] = 1
+            position_type[enter_short] = -1
+            position_type[exit_long | exit_short] = 0
+        return signals
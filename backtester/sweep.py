@@ -0,0 +1,217 @@
+import argparse
+import itertools
+import os
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+
+from backtester.datastore import get_store
+from backtester.memo import CACHE_DIR, RunCache
+from backtester.results_store import ResultsStore
+from backtester.strategies import TrendFollowing, MeanReversion
+from backtester.tester import PERIODS, run_strategy_test
+
+"""
+Parameter sweeps over tester.run_strategy_test
+    1) grid / random_search ~ turn a parameter spec into a list of configurations
+    2) iter_sweep ~ runs every (strategy, params, period) on a process pool and
+                    yields one summary row per run as it finishes
+    3) run_sweep ~ collects the rows into one table (optionally streamed to CSV,
+                   full runs optionally kept in a results store)
+
+Each worker maps the market data cache (datastore.get_store) once when it
+starts and reuses it for every run it is given, so only the parameters
+travel between processes. From the command line, finished runs are kept in
+a memo.RunCache, so repeated or overlapping sweeps reuse them.
+"""
+
+STRATEGIES = {
+    "TrendFollowing": TrendFollowing,
+    "MeanReversion": MeanReversion,
+}
+
+_prices = None
+_cache = None
+
+
+def grid(**params):
+    """
+    Every combination of the given parameter values
+
+    ex. grid(short_window=[5, 10], long_window=[20, 50]) -> 4 configurations
+    """
+    names = list(params)
+    return [dict(zip(names, values)) for values in itertools.product(*params.values())]
+
+
+def random_search(n, seed=0, **params):
+    """
+    n random configurations
+
+    Each parameter is either a list (picked from uniformly) or a (low, high)
+    tuple: ints are drawn from low..high inclusive, floats uniformly in [low, high)
+    """
+    rng = np.random.default_rng(seed)
+    configs = []
+    for _ in range(n):
+        config = {}
+        for name, spec in params.items():
+            if isinstance(spec, tuple):
+                low, high = spec
+                if isinstance(low, int) and isinstance(high, int):
+                    config[name] = int(rng.integers(low, high + 1))
+                else:
+                    config[name] = float(rng.uniform(low, high))
+            else:
+                config[name] = spec[rng.integers(len(spec))]
+        configs.append(config)
+    return configs
+
+
+def _init_worker(data=None, cache_dir=None):
+    global _prices, _cache
+    _prices = get_store().close_frame() if data is None else data
+    _cache = RunCache(cache_dir) if cache_dir else None
+
+
+def _run_config(task):
+    run_id, strategy_name, params, (start, end), start_cash, param_names, keep_runs = task
+    result = run_strategy_test(STRATEGIES[strategy_name], strategy_name, start, end, None,
+                               params=params, data=_prices, vectorized=True,
+                               start_cash=start_cash, cache=_cache)
+    row = {'run_id': run_id,
+           'strategy': strategy_name,
+           'period': result['period'],
+           **{name: params.get(name) for name in param_names},
+           'days': result['days'],
+           'trades': result['trades'],
+           'final_value': result['final_value']}
+    row.update(result['stats'])
+    if keep_runs:
+        return row, result['performance'], result['portfolio'].closed_trades
+    return row, None, None
+
+
+def iter_sweep(specs, periods=PERIODS, processes=None, start_cash=10000, data=None, keep_runs=False,
+               cache_dir=None):
+    """
+    Runs every configuration on every period, yielding (row, performance, closed_trades)
+    as each run finishes (performance and closed_trades are None unless keep_runs)
+
+    Args:
+        specs (dict): strategy name -> list of parameter dicts (see grid / random_search)
+        periods (list): (start_date, end_date) pairs
+        processes (int): worker processes, defaults to the number of cores
+        start_cash (float): starting cash for every run
+        data (pd.DataFrame): prices to sweep over instead of the market data
+                             cache, sent to each worker once
+        keep_runs (bool): send each run's equity curve and trades back too
+        cache_dir (str): memo.RunCache directory, runs already there are not recomputed
+    """
+    param_names = sorted({name for configs in specs.values() for params in configs for name in params})
+    tasks = [(run_id, name, params, period, start_cash, param_names, keep_runs)
+             for run_id, (name, params, period) in enumerate(
+                 (name, params, period)
+                 for name, configs in specs.items()
+                 for params in configs
+                 for period in periods)]
+    processes = processes or os.cpu_count()
+    chunksize = max(1, len(tasks) // (processes * 8))
+    if data is None:
+        get_store()  # build the cache once before the workers map it
+    with Pool(processes, initializer=_init_worker, initargs=(data, cache_dir)) as pool:
+        for item in pool.imap_unordered(_run_config, tasks, chunksize):
+            yield item
+
+
+def run_sweep(specs, periods=PERIODS, processes=None, start_cash=10000, out=None, data=None,
+              store=None, cache_dir=None):
+    """
+    Runs a sweep and returns one row per (strategy, params, period), ordered by run_id
+
+    Rows are appended to the CSV at out (if given) as soon as each run finishes.
+    With a results_store.ResultsStore as store, every run's equity curve,
+    trades and metrics are written to it in the background, keyed by run_id.
+    With cache_dir, runs cached by an earlier (or overlapping) sweep are
+    reused instead of recomputed.
+    """
+    rows = []
+    writer = store.writer() if store is not None else None
+    try:
+        for row, performance, trades in iter_sweep(specs, periods, processes, start_cash, data,
+                                                   keep_runs=store is not None, cache_dir=cache_dir):
+            if out is not None:
+                pd.DataFrame([row]).to_csv(out, mode='a', header=not rows, index=False)
+            if writer is not None:
+                metrics = {k: v for k, v in row.items() if k not in ('run_id', 'strategy', 'period')}
+                writer.submit(str(row['run_id']), performance, trades, metrics,
+                              strategy=row['strategy'], period=row['period'])
+            rows.append(row)
+    finally:
+        if writer is not None:
+            writer.close()
+    if not rows:
+        return pd.DataFrame()
+    return pd.DataFrame(rows).sort_values('run_id').reset_index(drop=True)
+
+
+def _parse_value(text):
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            pass
+    return text
+
+
+def _parse_spec(items):
+    """name=v1,v2,... -> list of values, name=low:high -> (low, high) range"""
+    params = {}
+    for item in items:
+        name, values = item.split("=", 1)
+        if ":" in values:
+            low, high = values.split(":", 1)
+            params[name] = (_parse_value(low), _parse_value(high))
+        else:
+            params[name] = [_parse_value(v) for v in values.split(",")]
+    return params
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Parameter sweep, ex. --strategy TrendFollowing short_window=3,5,10 long_window=20:60 --random 50")
+    parser.add_argument("--strategy", choices=list(STRATEGIES), required=True)
+    parser.add_argument("params", nargs="*", help="name=v1,v2,... (grid) or name=low:high (random search)")
+    parser.add_argument("--random", type=int, default=0, help="number of random configurations (default: full grid)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--cash", type=float, default=10000)
+    parser.add_argument("--full-period", action="store_true", help="only run the full period")
+    parser.add_argument("--out", default="results/sweep.csv")
+    parser.add_argument("--cache", default=CACHE_DIR, help="run cache directory")
+    parser.add_argument("--no-cache", action="store_true", help="recompute every run")
+    parser.add_argument("--store", default=None, help="also keep every run's equity curve and trades in this results store")
+    args = parser.parse_args(argv)
+
+    params = _parse_spec(args.params)
+    if args.random:
+        configs = random_search(args.random, args.seed, **params)
+    else:
+        if any(isinstance(spec, tuple) for spec in params.values()):
+            parser.error("low:high ranges need --random")
+        configs = grid(**params)
+    periods = [(None, None)] if args.full_period else PERIODS
+
+    if os.path.exists(args.out):
+        os.remove(args.out)
+    store = ResultsStore(args.store, reset=True) if args.store else None
+    summary = run_sweep({args.strategy: configs}, periods, args.processes, args.cash, out=args.out,
+                        store=store, cache_dir=None if args.no_cache else args.cache)
+    print(f"{len(summary)} runs -> {args.out}")
+    if len(summary):
+        print(summary.sort_values("Sharpe", ascending=False).head(10).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
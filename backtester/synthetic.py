@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+"""
+Deterministic synthetic market data for benchmarks and experiments
+    1) synthetic_ohlcv ~ long format Date, Ticker, Close, High, Low, Open, Volume
+                         (same layout as Data/clean_stock_data.csv)
+    2) synthetic_closes ~ Date x ticker closing prices (same layout as
+                          Data/date_close_data.csv, indexed by Date)
+
+Prices follow a geometric random walk per ticker. The same (days, tickers,
+bars_per_day, seed) always produces the same data.
+"""
+
+
+def _bar_labels(days, bars_per_day):
+    dates = pd.bdate_range('2000-01-03', periods=days)
+    if bars_per_day == 1:
+        return [d.strftime('%Y-%m-%d') for d in dates]
+    # intraday bars: one per minute from the 09:30 open
+    minutes = pd.to_timedelta(np.arange(bars_per_day) + 9 * 60 + 30, unit='min')
+    stamps = (dates.values[:, None] + minutes.values[None, :]).ravel()
+    return [str(s)[:16].replace('T', ' ') for s in stamps]
+
+
+def _walk(n_bars, n_tickers, seed):
+    rng = np.random.default_rng(seed)
+    start = rng.uniform(20, 500, n_tickers)
+    vol = rng.uniform(0.005, 0.03, n_tickers)
+    steps = rng.standard_normal((n_bars, n_tickers)) * vol
+    return rng, start * np.exp(np.cumsum(steps, axis=0))
+
+
+def synthetic_closes(days, tickers, bars_per_day=1, seed=0):
+    """
+    Args:
+        days (int): trading days
+        tickers (int): number of symbols (named T0000, T0001, ...)
+        bars_per_day (int): 1 for daily bars, 390 for minute bars
+        seed (int): random seed
+    """
+    _, close = _walk(days * bars_per_day, tickers, seed)
+    names = [f'T{i:04d}' for i in range(tickers)]
+    index = pd.Index(_bar_labels(days, bars_per_day), name='Date')
+    return pd.DataFrame(close, index=index, columns=names)
+
+
+def synthetic_ohlcv(days, tickers, bars_per_day=1, seed=0):
+    """Long format OHLCV bars whose closes match synthetic_closes with the same arguments"""
+    rng, close = _walk(days * bars_per_day, tickers, seed)
+    n_bars = len(close)
+    open_ = np.vstack([close[:1], close[:-1]]) * np.exp(rng.normal(0, 0.002, close.shape))
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.01, close.shape))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.01, close.shape))
+    volume = rng.integers(10_000, 10_000_000, close.shape)
+    return pd.DataFrame({
+        'Date': np.repeat(_bar_labels(days, bars_per_day), tickers),
+        'Ticker': np.tile([f'T{i:04d}' for i in range(tickers)], n_bars),
+        'Close': close.ravel(),
+        'High': high.ravel(),
+        'Low': low.ravel(),
+        'Open': open_.ravel(),
+        'Volume': volume.ravel(),
+    })
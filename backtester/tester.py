@@ -2,13 +2,18 @@
 import pandas as pd
 import os
 from pathlib import Path
+from backtester.datastore import get_store
 from backtester.engine import BTE
+from backtester.indicators import IndicatorSet
+from backtester.memo import RunCache
+from backtester.metrics import batch_metrics, stack_runs
 from backtester.portfolio import Portfolio
+from backtester.results_store import ResultsStore
+from backtester.runner import MultiRunner, warm_starts
 from backtester.strategies import TrendFollowing, MeanReversion
 from datetime import datetime
 
 PROJECT_ROOT = Path.cwd()
-print(f"Working in: {PROJECT_ROOT.absolute()}")
 
 def ensure_directories():
     output_dir = PROJECT_ROOT / "results"
@@ -22,21 +27,81 @@ def safe_csv_save(df, filename, output_dir):
     print(f"SAVED: {filepath.absolute()}")
     return filepath
 
-def run_strategy_test(strategy_class, strategy_name, start_date, end_date, output_dir):
-    """Test ONE strategy on ONE period"""
-    portfolio = Portfolio(start_cash=10000)
-    
-    if strategy_name == "TrendFollowing":
-        strategy = strategy_class(short_window=5, long_window=20, position_size=10)
-    else:  # MeanReversion
-        strategy = strategy_class(mean_window=20, threshold_pct=0.02, position_size=10)
+DEFAULT_PARAMS = {
+    "TrendFollowing": dict(short_window=5, long_window=20, position_size=10),
+    "MeanReversion": dict(mean_window=20, threshold_pct=0.02, position_size=10),
+}
+
+PERIODS = [
+    (None, None),           # Full period
+    ("2020-01-01", "2020-12-31"),
+    ("2021-01-01", "2021-12-31"),
+    ("2022-01-01", None),
+]
+
+def run_strategy_test(strategy_class, strategy_name, start_date, end_date, output_dir,
+                      params=None, data=None, vectorized=False, start_cash=10000, cache=None, warmup=0):
+    """
+    Test ONE strategy on ONE period
+
+    params defaults to DEFAULT_PARAMS[strategy_name], data (preloaded prices)
+    is read by the engine when not given, and nothing is saved when
+    output_dir is None. With a memo.RunCache as cache, a run already in the
+    cache is rebuilt from it instead of being recomputed. warmup bars before
+    start_date warm the strategy's indicators first (None for all, see BTE.warm_up).
+    """
+    if params is None:
+        params = DEFAULT_PARAMS[strategy_name]
+    if data is None:
+        data = get_store().close_frame()
+
+    key = None
+    if cache is not None:
+        key = cache.key(strategy_class, params, start_date, end_date, start_cash, data, warmup)
+        entry = cache.get(key)
+        if entry is not None:
+            engine = BTE(portfolio=entry['portfolio'], strategy=strategy_class(**params), data=data)
+            return summarize_run(engine, strategy_name, start_date, end_date, engine.build_results(),
+                                 output_dir, stats=entry['stats'], warmup=warmup)
+
+    portfolio = Portfolio(start_cash=start_cash)
+    strategy = strategy_class(**params)
     
-    engine = BTE(portfolio=portfolio, strategy=strategy)
-    performance = engine.run_backtest(start_date=start_date, end_date=end_date)
-    stats = engine.comp_performance(performance)
+    engine = BTE(portfolio=portfolio, strategy=strategy, data=data)
+    if vectorized:
+        performance = engine.run_vectorized(start_date=start_date, end_date=end_date, warmup=warmup)
+    else:
+        performance = engine.run_backtest(start_date=start_date, end_date=end_date, warmup=warmup)
+    result = summarize_run(engine, strategy_name, start_date, end_date, performance, output_dir, warmup=warmup)
+    if cache is not None:
+        cache.put(key, {'portfolio': portfolio, 'stats': result['stats']})
+    return result
+
+def run_id(strategy_name, start_date):
+    """Key a run of main is saved under in the results store"""
+    return f"{strategy_name}_{start_date or 'full'}"
+
+def run_name(strategy_name, start_date, end_date, warmup=0):
+    """CSV file stem of one run: strategy, whole period and warm-up, so runs never overwrite each other"""
+    name = f"{strategy_name}_{start_date or 'start'}_to_{end_date or 'end'}"
+    if warmup != 0:
+        name += f"_warm{'all' if warmup is None else warmup}"
+    return name
+
+def summarize_run(engine, strategy_name, start_date, end_date, performance, output_dir, writer=None,
+                  stats=None, warmup=0):
+    """
+    Builds the result row for one finished run and saves it: as CSVs (unless
+    output_dir is None, named by run_name) and/or to a results store through
+    writer (a results_store.BackgroundWriter). stats (comp_performance
+    output) is computed when not given
+    """
+    portfolio = engine.portfolio
+    if stats is None:
+        stats = engine.comp_performance(performance)
     
     final_value = performance['Portfolio_value'].iloc[-1]
-    total_return = (final_value / 10000 - 1) * 100
+    total_return = (final_value / performance['Portfolio_value'].iloc[0] - 1) * 100
     max_dd = performance['Drawdown'].min() * 100
     
     result = {
@@ -48,20 +113,87 @@ def run_strategy_test(strategy_class, strategy_name, start_date, end_date, outpu
         'total_return_pct': total_return,
         'max_dd_pct': max_dd,
         'sharpe': stats['Sharpe'],
+        'stats': stats,
         'performance': performance,
         'portfolio': portfolio
     }
     
+    if writer is not None:
+        writer.submit(run_id(strategy_name, start_date), performance, portfolio.closed_trades, stats,
+                      strategy=strategy_name, period=result['period'],
+                      start_date=start_date, end_date=end_date)
+
+    if output_dir is None:
+        return result
+
     # Save detailed files
-    safe_csv_save(result['performance'], 
-                 f"{strategy_name}_{start_date or 'full'}_equity.csv", output_dir)
-    trades_df = pd.DataFrame(result['portfolio'].closed_trades)
-    safe_csv_save(trades_df, 
-                 f"{strategy_name}_{start_date or 'full'}_trades.csv", output_dir)
+    name = run_name(strategy_name, start_date, end_date, warmup)
+    safe_csv_save(result['performance'], f"{name}_equity.csv", output_dir)
+    trades_df = result['portfolio'].closed_trades.to_frame()
+    safe_csv_save(trades_df, f"{name}_trades.csv", output_dir)
     
     return result
 
-def main():
+def run_period_test(strategies, start_date, end_date, output_dir, start_cash=10000, writer=None,
+                    cache=None, warm=None):
+    """
+    Test SEVERAL strategies on ONE period in a single pass over the data
+
+    Args:
+        strategies (list): (strategy_class, strategy_name) pairs, run with DEFAULT_PARAMS
+        cache (memo.RunCache): strategies already in the cache are rebuilt from it,
+                               only the others are run
+        warm (list): strategy objects already warmed up to start_date, one per
+                     strategies pair (see runner.warm_starts), cold when None
+    """
+    data = get_store().close_frame()
+    warmup = 0 if warm is None or not start_date else None
+    keys = [cache.key(strategy_class, DEFAULT_PARAMS[strategy_name], start_date, end_date, start_cash, data,
+                      warmup)
+            if cache is not None else None
+            for strategy_class, strategy_name in strategies]
+    entries = [cache.get(key) if cache is not None else None for key in keys]
+
+    shared = IndicatorSet()
+    todo = [i for i, entry in enumerate(entries) if entry is None]
+    pairs = [(strategies[i][0](**DEFAULT_PARAMS[strategies[i][1]], indicators=shared) if warm is None else warm[i],
+              Portfolio(start_cash=start_cash))
+             for i in todo]
+    engines = [None] * len(strategies)
+    performances = [None] * len(strategies)
+    stats = [None] * len(strategies)
+    if pairs:
+        runner = MultiRunner(pairs, data=data)
+        results = runner.run(start_date=start_date, end_date=end_date)
+        # metrics for every strategy run in one batch
+        runs = {i: (performance, engine.portfolio.closed_trades, engine.portfolio.tickers)
+                for i, engine, performance in zip(todo, runner.engines, results)}
+        batch = batch_metrics(*stack_runs(runs))
+        for i, engine, performance in zip(todo, runner.engines, results):
+            engines[i], performances[i], stats[i] = engine, performance, batch.loc[i].to_dict()
+            if cache is not None:
+                cache.put(keys[i], {'portfolio': engine.portfolio, 'stats': stats[i]})
+    for i, entry in enumerate(entries):
+        if entry is not None:
+            strategy_class, strategy_name = strategies[i]
+            engines[i] = BTE(entry['portfolio'], strategy_class(**DEFAULT_PARAMS[strategy_name]), data=data)
+            performances[i], stats[i] = engines[i].build_results(), entry['stats']
+
+    return [summarize_run(engine, strategy_name, start_date, end_date, performance, output_dir, writer,
+                          stats=stat, warmup=warmup)
+            for engine, (_, strategy_name), performance, stat
+            in zip(engines, strategies, performances, stats)]
+
+def main(warm_start=False):
+    """
+    Both strategies over every period in PERIODS, saved to results/
+
+    Args:
+        warm_start (bool): start every period with the indicators warmed on
+                           all the bars before it, precomputed for every period
+                           in one pass (runner.warm_starts), instead of cold
+    """
+    print(f"Working in: {PROJECT_ROOT.absolute()}")
     print("BOTH STRATEGIES - MULTI-PERIOD BACKTEST")
     print("=" * 70)
     
@@ -69,16 +201,11 @@ def main():
         print("ERROR: Data/date_close_data.csv not found!")
         return
     
-    data_info = pd.read_csv('Data/date_close_data.csv')
-    print(f"Data: {len(data_info)} days ({data_info['Date'].min()} to {data_info['Date'].max()})")
+    data_info = get_store()
+    print(f"Data: {len(data_info.dates)} days ({data_info.dates[0]} to {data_info.dates[-1]})")
     
     output_dir = ensure_directories()
-    periods = [
-        (None, None),           # Full period
-        ("2020-01-01", "2020-12-31"),
-        ("2021-01-01", "2021-12-31"),
-        ("2022-01-01", None),
-    ]
+    periods = PERIODS
     
     all_results = []
     strategies = [
@@ -89,13 +216,26 @@ def main():
     print("\n" + "="*70)
     print("TESTING BOTH STRATEGIES...")
     
-    for strategy_class, strategy_name in strategies:
-        print(f"\n{strategy_name}")
+    # equity curves and trades go to one results store, written in the background
+    store = ResultsStore(str(output_dir / "runs.bin"), reset=True)
+    # runs whose strategy, parameters, period, data and code are unchanged come from the cache
+    cache = RunCache()
+    warm = {}
+    if warm_start:
+        shared = IndicatorSet()
+        warm = warm_starts([strategy_class(**DEFAULT_PARAMS[strategy_name], indicators=shared)
+                            for strategy_class, strategy_name in strategies],
+                           [start for start, _ in periods])
+    with store.writer() as writer:
         for i, (start, end) in enumerate(periods):
-            print(f"  Period {i+1}: {start} to {end}", end=" ... ")
-            result = run_strategy_test(strategy_class, strategy_name, start, end, output_dir)
-            all_results.append(result)
-            print(f"{result['total_return_pct']:+5.1f}% ({result['trades']} trades)")
+            print(f"\nPeriod {i+1}: {start} to {end}")
+            for result in run_period_test(strategies, start, end, None, writer=writer, cache=cache,
+                                          warm=warm.get(start)):
+                all_results.append({k: v for k, v in result.items() if k != 'stats'})
+                print(f"  {result['strategy']:<15} {result['total_return_pct']:+5.1f}% ({result['trades']} trades)")
+    print(f"\nRun cache: {cache.hits} reused, {cache.misses} computed")
+    # keep the summary grouped by strategy
+    all_results.sort(key=lambda r: [name for _, name in strategies].index(r['strategy']))
     
 
     print("\n" + "="*70)
@@ -119,8 +259,8 @@ def main():
           f"Drawdown: {best_overall['max_dd_pct']:.1f}%")
     
     print("\nALL FILES CREATED:")
-    csv_files = sorted(output_dir.glob("*.csv"))
-    for f in csv_files:
+    files = [output_dir / "BOTH_STRATEGIES_ALL_PERIODS.csv", Path(store.path), Path(store.index_path)]
+    for f in files:
         size = f.stat().st_size / 1024
         print(f"{f.name:<35} ({size:4.1f} KB)")
 
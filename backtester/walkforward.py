@@ -0,0 +1,196 @@
+import argparse
+import math
+import os
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+
+from backtester.datastore import get_store
+from backtester.memo import CACHE_DIR
+from backtester.metrics import METRICS, batch_metrics
+from backtester.records import column
+from backtester import sweep
+from backtester.sweep import STRATEGIES, _init_worker, _parse_spec, grid, random_search
+from backtester.tester import run_strategy_test
+
+"""
+Walk-forward optimization
+    1) folds ~ train/test windows over the trading dates: the train window
+               either rolls (fixed length) or expands (always from the first
+               date), the test window is the next test bars after it
+    2) walk_forward ~ for every fold, runs every configuration on the train
+                      window, picks the one with the best objective (ex.
+                      Sharpe) and runs it on the test window
+    3) the out-of-sample test segments are chained by their daily returns into
+       one equity curve starting at start_cash (each test run itself starts
+       flat, from start_cash)
+    4) warmup ~ bars before each window that warm the strategy's indicators
+                (BTE.warm_up): a test run can then trade from its first bar
+                instead of spending long_window bars of it filling its averages
+
+Train runs of every fold go to one process pool at once, then every fold's
+test run does. Workers load the prices once when they start, so only
+parameters and results travel between processes.
+"""
+
+def _run(task):
+    # workers are set up by sweep._init_worker (prices and run cache)
+    task_id, strategy_name, params, start, end, start_cash, keep_curve, warmup = task
+    result = run_strategy_test(STRATEGIES[strategy_name], strategy_name, start, end, None,
+                               params=params, data=sweep._prices, vectorized=True,
+                               start_cash=start_cash, cache=sweep._cache, warmup=warmup)
+    if not keep_curve:
+        return task_id, result['stats'], None, None
+    pnl = column(result['portfolio'].closed_trades, 'pnl').tolist()
+    return task_id, result['stats'], result['performance']['Portfolio_value'], pnl
+
+
+def folds(dates, train=252, test=63, expanding=False):
+    """
+    Train/test windows over sorted dates
+
+    Args:
+        dates (list): trading dates
+        train (int): bars in the (first) train window
+        test (int): bars in each test window, also the step between folds
+        expanding (bool): train from the first date every time instead of rolling
+
+    Returns:
+        list: (train_start, train_end, test_start, test_end) date tuples, inclusive
+    """
+    windows = []
+    for i in range(train, len(dates), test):
+        first = 0 if expanding else i - train
+        last = min(i + test, len(dates))
+        windows.append((dates[first], dates[i - 1], dates[i], dates[last - 1]))
+    return windows
+
+
+def _score(stats, objective):
+    value = stats.get(objective)
+    return -math.inf if value is None or value != value else value
+
+
+def walk_forward(strategy_name, configs, train=252, test=63, expanding=False, objective="Sharpe",
+                 processes=None, start_cash=10000, data=None, cache_dir=None, warmup=0):
+    """
+    Runs a walk-forward optimization
+
+    Args:
+        strategy_name (str): key of sweep.STRATEGIES
+        configs (list): parameter dicts to choose from (see sweep.grid / random_search)
+        train, test, expanding: window layout, see folds
+        objective (str): comp_performance metric to maximize on the train window
+        processes (int): worker processes, defaults to the number of cores
+        start_cash (float): starting cash of every run (and the stitched curve)
+        data (pd.DataFrame): prices, the market data cache when not given
+        cache_dir (str): memo.RunCache directory to reuse runs from, off when None
+        warmup (int): bars before every train / test window that only warm the
+                      indicators (None for all of them), cold windows when 0
+
+    Returns:
+        (pd.DataFrame, pd.DataFrame, dict): one row per fold (windows, chosen
+        parameters, train objective, test metrics), the stitched out-of-sample
+        equity curve, and the metrics of that curve
+    """
+    if objective not in METRICS:
+        raise ValueError(f"unknown objective {objective!r}, expected one of {METRICS}")
+    dates = list(data.index) if data is not None else get_store().dates.tolist()
+    windows = folds(dates, train, test, expanding)
+    if not windows:
+        raise ValueError(f"{len(dates)} dates are not enough for a {train} bar train window")
+
+    processes = processes or os.cpu_count()
+    if data is None:
+        get_store()  # build the cache once before the workers map it
+    with Pool(processes, initializer=_init_worker, initargs=(data, cache_dir)) as pool:
+        # every fold's search at once
+        tasks = [((k, c), strategy_name, params, train_start, train_end, start_cash, False, warmup)
+                 for k, (train_start, train_end, _, _) in enumerate(windows)
+                 for c, params in enumerate(configs)]
+        best = {}
+        for (k, c), stats, _, _ in pool.imap_unordered(_run, tasks):
+            score = _score(stats, objective)
+            if k not in best or (score, -c) > (best[k][0], -best[k][1]):
+                best[k] = (score, c)
+
+        tasks = [(k, strategy_name, configs[best[k][1]], test_start, test_end, start_cash, True, warmup)
+                 for k, (_, _, test_start, test_end) in enumerate(windows)]
+        tests = {k: (stats, curve, pnl) for k, stats, curve, pnl in pool.imap_unordered(_run, tasks)}
+
+    rows = []
+    segments = []
+    pnls = []
+    for k, (train_start, train_end, test_start, test_end) in enumerate(windows):
+        score, c = best[k]
+        stats, curve, pnl = tests[k]
+        rows.append({'fold': k,
+                     'train_start': train_start, 'train_end': train_end,
+                     'test_start': test_start, 'test_end': test_end,
+                     **configs[c],
+                     f'train_{objective}': score,
+                     **{f'test_{name}': value for name, value in stats.items()}})
+        values = curve.to_numpy()
+        # returns against the segment's START row (its start cash)
+        returns = pd.Series(values[1:] / values[:-1] - 1, index=curve.index[1:])
+        segments.append(pd.DataFrame({'Daily_Return': returns, 'fold': k}))
+        pnls.extend(pnl)
+
+    oos = pd.concat(segments)
+    oos.index.name = 'Date'
+    oos['Portfolio_value'] = start_cash * (1 + oos['Daily_Return']).cumprod()
+    oos['Rolling_Max'] = oos['Portfolio_value'].cummax()
+    oos['Drawdown'] = (oos['Portfolio_value'] - oos['Rolling_Max']) / oos['Rolling_Max']
+    oos = oos[['Portfolio_value', 'Daily_Return', 'Rolling_Max', 'Drawdown', 'fold']]
+
+    equity = np.concatenate([[start_cash], oos['Portfolio_value'].to_numpy()])
+    trades = pd.DataFrame({'run_id': 0, 'pnl': np.asarray(pnls, dtype=float)})
+    summary = batch_metrics(equity[None], trades).iloc[0].to_dict()
+    del summary['Exposure']
+    return pd.DataFrame(rows), oos, summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Walk-forward optimization, ex. --strategy TrendFollowing short_window=3,5,10 long_window=20,50")
+    parser.add_argument("--strategy", choices=list(STRATEGIES), required=True)
+    parser.add_argument("params", nargs="*", help="name=v1,v2,... (grid) or name=low:high (random search)")
+    parser.add_argument("--random", type=int, default=0, help="number of random configurations (default: full grid)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--train", type=int, default=252, help="bars per train window")
+    parser.add_argument("--test", type=int, default=63, help="bars per test window (and step)")
+    parser.add_argument("--expanding", action="store_true", help="expanding instead of rolling train windows")
+    parser.add_argument("--objective", choices=METRICS, default="Sharpe")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--cash", type=float, default=10000)
+    parser.add_argument("--warmup", type=int, default=0,
+                        help="bars before each window that warm the indicators (-1 for all, default: cold)")
+    parser.add_argument("--cache", default=CACHE_DIR, help="run cache directory")
+    parser.add_argument("--no-cache", action="store_true", help="recompute every run")
+    parser.add_argument("--out", default="results/walkforward")
+    args = parser.parse_args(argv)
+
+    params = _parse_spec(args.params)
+    if args.random:
+        configs = random_search(args.random, args.seed, **params)
+    else:
+        if any(isinstance(spec, tuple) for spec in params.values()):
+            parser.error("low:high ranges need --random")
+        configs = grid(**params)
+
+    table, oos, summary = walk_forward(args.strategy, configs, args.train, args.test, args.expanding,
+                                       args.objective, args.processes, args.cash,
+                                       cache_dir=None if args.no_cache else args.cache,
+                                       warmup=None if args.warmup < 0 else args.warmup)
+    table.to_csv(f"{args.out}_folds.csv", index=False)
+    oos.to_csv(f"{args.out}_equity.csv")
+    print(table.to_string(index=False))
+    print("\nOut-of-sample:")
+    for name, value in summary.items():
+        print(f"  {name:<14} {value:.4f}")
+    print(f"\n-> {args.out}_folds.csv, {args.out}_equity.csv")
+
+
+if __name__ == "__main__":
+    main()
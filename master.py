@@ -1,6 +1,4 @@
-import backtester.tester as tester
-tester.main()
-from Visuals import candlestick
-from Visuals import Equity_DD_curve
-from Visuals import Trade_analysis
+from backtester.cli import main
 
+main(["run"])
+main(["plot"])
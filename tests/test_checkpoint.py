@@ -0,0 +1,62 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from backtester.engine import BTE
+from backtester.portfolio import Portfolio
+from backtester.strategies import MeanReversion, TrendFollowing
+from backtester.tester import DEFAULT_PARAMS
+
+ROOT = Path(__file__).resolve().parents[1]
+STOP = "2021-03-15"
+
+
+@pytest.fixture(autouse=True)
+def repo_root(monkeypatch):
+    # the market data cache reads Data/ relative to the working directory
+    monkeypatch.chdir(ROOT)
+
+
+def engine(strategy_class):
+    return BTE(Portfolio(start_cash=10000), strategy_class(**DEFAULT_PARAMS[strategy_class.__name__]))
+
+
+@pytest.mark.parametrize("start_date, warmup", [(None, 0), ("2020-06-01", 30)])
+@pytest.mark.parametrize("mode", ['run_backtest', 'run_vectorized'])
+@pytest.mark.parametrize("strategy_class", [TrendFollowing, MeanReversion])
+def test_resume_from_checkpoint_matches_full_run(strategy_class, mode, start_date, warmup, tmp_path):
+    full = engine(strategy_class)
+    expected = getattr(full, mode)(start_date=start_date, warmup=warmup)
+
+    first = engine(strategy_class)
+    getattr(first, mode)(start_date=start_date, end_date=STOP, warmup=warmup)
+    path = tmp_path / "run.ckpt"
+    first.save_checkpoint(path)
+    resumed = BTE.from_checkpoint(path)
+    performance = getattr(resumed, mode)(start_date=start_date)
+
+    pd.testing.assert_frame_equal(performance, expected)
+    assert resumed.portfolio.trades == full.portfolio.trades
+    assert resumed.portfolio.closed_trades == full.portfolio.closed_trades
+    assert performance.index.is_unique
+
+
+@pytest.mark.parametrize("mode", ['run_backtest', 'run_vectorized'])
+def test_second_run_on_one_engine_continues(mode):
+    full = engine(TrendFollowing)
+    expected = getattr(full, mode)()
+
+    twice = engine(TrendFollowing)
+    getattr(twice, mode)(end_date=STOP)
+    performance = getattr(twice, mode)()
+
+    pd.testing.assert_frame_equal(performance, expected)
+    assert twice.portfolio.trades == full.portfolio.trades
+
+
+def test_loop_cannot_resume_a_vectorized_run():
+    run = engine(TrendFollowing)
+    run.run_vectorized(end_date=STOP)
+    with pytest.raises(ValueError):
+        run.run_backtest()
@@ -0,0 +1,54 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from backtester.orders import STOP, OrderBook
+
+
+def fill(book, engine, side, quantity, price=100.0):
+    # BTE.fill updates the portfolio before calling on_fill
+    engine.portfolio.shares[0] += side * quantity
+    book.on_fill(engine, 0, side, quantity, price)
+
+
+def pending(book):
+    n = book.size
+    return list(zip(book.side[:n].tolist(), book.quantity[:n].tolist(), book.price[:n].tolist()))
+
+
+@pytest.fixture
+def engine():
+    return SimpleNamespace(portfolio=SimpleNamespace(shares=np.zeros(1)), ticker_ids=[0])
+
+
+def test_long_gets_a_sell_stop_below(engine):
+    book = OrderBook(stop_loss=0.05)
+    fill(book, engine, 1, 10)
+    fill(book, engine, 1, 5, price=110.0)
+    assert pending(book) == [(-1, 10.0, 95.0), (-1, 5.0, pytest.approx(104.5))]
+    assert book.kind[:book.size].tolist() == [STOP, STOP]
+
+
+def test_short_gets_a_buy_stop_above(engine):
+    book = OrderBook(stop_loss=0.05)
+    fill(book, engine, -1, 10)
+    assert pending(book) == [(1, 10.0, 105.0)]
+
+
+def test_cover_places_nothing_and_cancels_at_zero(engine):
+    book = OrderBook(stop_loss=0.05)
+    fill(book, engine, -1, 10)
+    fill(book, engine, 1, 4)
+    assert pending(book) == [(1, 10.0, 105.0)]
+    fill(book, engine, 1, 6)
+    assert pending(book) == []
+
+
+def test_crossing_zero_replaces_the_stops(engine):
+    book = OrderBook(stop_loss=0.05)
+    fill(book, engine, 1, 10)
+    fill(book, engine, -1, 15)
+    assert pending(book) == [(1, 5.0, 105.0)]
+    fill(book, engine, 1, 8)
+    assert pending(book) == [(-1, 3.0, 95.0)]
@@ -0,0 +1,36 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from backtester.engine import BTE
+from backtester.portfolio import Portfolio
+from backtester.strategies import MeanReversion, TrendFollowing
+from backtester.tester import DEFAULT_PARAMS, PERIODS
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+@pytest.fixture(autouse=True)
+def repo_root(monkeypatch):
+    # the market data cache reads Data/ relative to the working directory
+    monkeypatch.chdir(ROOT)
+
+
+def run(strategy_class, mode, start_date, end_date):
+    portfolio = Portfolio(start_cash=10000)
+    engine = BTE(portfolio, strategy_class(**DEFAULT_PARAMS[strategy_class.__name__]))
+    performance = getattr(engine, mode)(start_date=start_date, end_date=end_date)
+    return performance, portfolio
+
+
+@pytest.mark.parametrize("start_date, end_date", PERIODS)
+@pytest.mark.parametrize("strategy_class", [TrendFollowing, MeanReversion])
+def test_vectorized_matches_event_loop(strategy_class, start_date, end_date):
+    expected, loop = run(strategy_class, 'run_backtest', start_date, end_date)
+    performance, vectorized = run(strategy_class, 'run_vectorized', start_date, end_date)
+
+    pd.testing.assert_frame_equal(performance, expected)
+    assert vectorized.trades == loop.trades
+    assert vectorized.closed_trades == loop.closed_trades
+    assert len(loop.trades) > 0